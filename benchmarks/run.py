@@ -0,0 +1,321 @@
+#!/usr/bin/env python
+"""Benchmarks for Tablib.
+
+Runs offline on synthetic datasets and reports, for every core operation and
+for the import/export of every registered format, the best wall time, the
+throughput in rows per second and the peak memory allocated by the operation.
+
+Usage::
+
+    $ python benchmarks/run.py --rows 10000 --cols 10 --types int,float,str
+    $ python benchmarks/run.py --only export: --format csv > before.csv
+"""
+
+import argparse
+import datetime
+import decimal
+import gc
+import os
+import random
+import string
+import sys
+import time
+import tracemalloc
+
+# Benchmark the working tree rather than an installed release.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+import tablib  # noqa: E402
+from tablib.formats import registry  # noqa: E402
+
+BENCHMARKS = []
+
+
+def benchmark(name):
+    """Registers `func(dataset)` as a benchmark. It may return a callable
+    which is then timed instead, so that setup stays out of the measure."""
+    def decorator(func):
+        BENCHMARKS.append((name, func))
+        return func
+    return decorator
+
+
+# ----------------
+# Synthetic data
+# ----------------
+
+def _random_str(rnd):
+    return ''.join(rnd.choice(string.ascii_letters) for _ in range(rnd.randint(3, 12)))
+
+
+VALUE_FACTORIES = {
+    'int': lambda rnd: rnd.randint(-10 ** 6, 10 ** 6),
+    'float': lambda rnd: rnd.random() * 1000,
+    'str': _random_str,
+    'bool': lambda rnd: rnd.random() < 0.5,
+    'date': lambda rnd: datetime.date(2000, 1, 1) + datetime.timedelta(days=rnd.randint(0, 10000)),
+    'decimal': lambda rnd: decimal.Decimal(rnd.randint(0, 10 ** 6)) / 100,
+}
+
+
+def make_dataset(rows, cols, types=('int', 'float', 'str'), seed=0, duplicates=0.1):
+    """Returns a Dataset of `rows` x `cols`, cycling through `types` per column.
+    A `duplicates` fraction of the rows repeats earlier rows."""
+    rnd = random.Random(seed)
+    factories = [VALUE_FACTORIES[types[i % len(types)]] for i in range(cols)]
+    # Short headers, dBASE field names are limited to 10 characters.
+    headers = ['col%d' % i for i in range(cols)]
+
+    data = []
+    for i in range(rows):
+        if data and rnd.random() < duplicates:
+            data.append(data[rnd.randrange(len(data))])
+        else:
+            data.append(tuple(factory(rnd) for factory in factories))
+    return tablib.Dataset(*data, headers=headers, title='benchmark')
+
+
+# ----------
+# Operations
+# ----------
+
+@benchmark('append')
+def bench_append(dataset):
+    rows = dataset[:]
+
+    def run():
+        dset = tablib.Dataset(headers=dataset.headers)
+        for row in rows:
+            dset.append(row)
+    return run
+
+
+@benchmark('extend')
+def bench_extend(dataset):
+    rows = dataset[:]
+
+    def run():
+        tablib.Dataset(headers=dataset.headers).extend(rows)
+    return run
+
+
+@benchmark('lpush/lpop window')
+def bench_window(dataset):
+    rows = dataset[:]
+    window = max(len(rows) // 2, 1)
+
+    def run():
+        dset = tablib.Dataset(headers=dataset.headers, storage='deque')
+        for row in rows:
+            dset.lpush(row)
+            if len(dset) > window:
+                dset.rpop()
+        while dset:
+            dset.lpop()
+    return run
+
+
+@benchmark('iter')
+def bench_iter(dataset):
+    return lambda: sum(1 for _ in dataset)
+
+
+@benchmark('iter_rows(namedtuple)')
+def bench_iter_rows(dataset):
+    return lambda: sum(1 for _ in dataset.iter_rows(as_='namedtuple'))
+
+
+@benchmark('sort')
+def bench_sort(dataset):
+    return lambda: dataset.sort(0)
+
+
+@benchmark('subset')
+def bench_subset(dataset):
+    rows = list(range(0, dataset.height, 2))
+    cols = dataset.headers[::2]
+    return lambda: dataset.subset(rows=rows, cols=cols)
+
+
+@benchmark('select')
+def bench_select(dataset):
+    cols = dataset.headers[::-2]
+    return lambda: dataset.select(cols)
+
+
+@benchmark('transpose')
+def bench_transpose(dataset):
+    return dataset.transpose
+
+
+@benchmark('stack')
+def bench_stack(dataset):
+    return lambda: dataset.stack(dataset)
+
+
+@benchmark('stack_cols')
+def bench_stack_cols(dataset):
+    other = tablib.Dataset(*dataset[:], headers=['o%s' % h for h in dataset.headers])
+    return lambda: dataset.stack_cols(other)
+
+
+@benchmark('concat')
+def bench_concat(dataset):
+    shards = [dataset.subset(rows=range(i, dataset.height, 10)) for i in range(10)]
+    return lambda: tablib.concat(shards)
+
+
+@benchmark('join')
+def bench_join(dataset):
+    lookup = tablib.Dataset(*[(i, 'label%d' % i) for i in range(0, dataset.height, 3)],
+                            headers=['key', 'label'])
+    keyed = tablib.concat_cols([
+        tablib.Dataset(*[(i,) for i in range(dataset.height)], headers=['key']), dataset
+    ])
+    return lambda: keyed.join(lookup, on='key', how='left')
+
+
+@benchmark('group_by')
+def bench_group_by(dataset):
+    aggregates = {col: 'count' for col in range(1, dataset.width)}
+    return lambda: dataset.group_by(0).agg(aggregates)
+
+
+@benchmark('diff')
+def bench_diff(dataset):
+    keyed = [(i,) + tuple(row) for i, row in enumerate(dataset)]
+    headers = ['key'] + dataset.headers
+    old = tablib.Dataset(*keyed, headers=headers)
+    # Drops the first tenth of the rows, changes one row in ten and adds as
+    # many rows as dropped.
+    start = len(keyed) // 10
+    new = tablib.Dataset(*[
+        (row[0], None) + row[2:] if row[0] % 10 == 5 else row
+        for row in keyed[start:] + [(len(keyed) + i,) + keyed[i][1:] for i in range(start)]
+    ], headers=headers)
+    return lambda: old.diff(new, key='key')
+
+
+@benchmark('filter')
+def bench_filter(dataset):
+    tagged = tablib.Dataset(headers=dataset.headers)
+    for i, row in enumerate(dataset):
+        tagged.append(row, tags=['tag%d' % (i % 10), 'even' if i % 2 else 'odd'])
+
+    def run():
+        tagged.filter(['tag1', 'tag2']).filter('odd')
+    return run
+
+
+@benchmark('remove_duplicates')
+def bench_remove_duplicates(dataset):
+    rows = dataset[:]
+
+    def run():
+        # remove_duplicates works in place, so each run needs a fresh dataset.
+        dset = tablib.Dataset(*rows, headers=dataset.headers)
+        dset.remove_duplicates()
+    return run
+
+
+@benchmark('_package')
+def bench_package(dataset):
+    return dataset._package
+
+
+@benchmark('_package(dicts=False)')
+def bench_package_lists(dataset):
+    return lambda: dataset._package(dicts=False)
+
+
+def _format_benchmarks(dataset):
+    """Yields (name, func) export and import benchmarks for every available
+    registered format."""
+    for key in list(registry._formats):
+        if not registry.is_available(key):
+            continue
+        fmt = registry.get_format(key)
+        if hasattr(fmt, 'export_set'):
+            yield 'export:%s' % key, lambda dataset, key=key: lambda: dataset.export(key)
+        if hasattr(fmt, 'export_set') and hasattr(fmt, 'import_set'):
+            def bench_import(dataset, key=key):
+                exported = dataset.export(key)
+                return lambda: tablib.Dataset().load(exported, format=key)
+            yield 'import:%s' % key, bench_import
+
+
+# ------
+# Runner
+# ------
+
+def measure(func, dataset, repeat):
+    """Returns (best seconds, peak bytes) for the benchmark `func`."""
+    run = func(dataset) or (lambda: None)
+
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return min(timings), peak
+
+
+def run_benchmarks(dataset, repeat=3, only=None):
+    """Runs all benchmarks whose name starts with one of `only` and returns
+    the results as a Dataset."""
+    results = tablib.Dataset(
+        headers=['benchmark', 'rows', 'cols', 'seconds', 'rows/s', 'peak KiB', 'error'],
+        title='results',
+    )
+    benchmarks = BENCHMARKS + list(_format_benchmarks(dataset))
+    for name, func in benchmarks:
+        if only and not name.startswith(tuple(only)):
+            continue
+        try:
+            seconds, peak = measure(func, dataset, repeat)
+        except Exception as exc:
+            results.append((name, dataset.height, dataset.width, None, None, None, repr(exc)))
+            continue
+        throughput = dataset.height / seconds if seconds else None
+        results.append((
+            name, dataset.height, dataset.width, round(seconds, 6),
+            round(throughput) if throughput else None, round(peak / 1024, 1), '',
+        ))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--cols', type=int, default=10)
+    parser.add_argument('--types', default='int,float,str,date',
+                        help='comma separated column types among %s' % ', '.join(VALUE_FACTORIES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--only', action='append',
+                        help='only run benchmarks starting with this prefix (repeatable)')
+    parser.add_argument('--format', default=None,
+                        help='print the results in this Tablib format instead of a table')
+    args = parser.parse_args(argv)
+
+    dataset = make_dataset(args.rows, args.cols, types=args.types.split(','), seed=args.seed)
+    results = run_benchmarks(dataset, repeat=args.repeat, only=args.only)
+
+    if args.format:
+        print(results.export(args.format))
+    else:
+        print(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -38,7 +38,10 @@ setup(
     ],
     python_requires='>=3.5',
     extras_require={
-        'all': ['markuppy', 'odfpy', 'openpyxl>=2.6.0', 'pandas', 'pyyaml', 'tabulate', 'xlrd', 'xlwt'],
+        'all': [
+            'markuppy', 'odfpy', 'openpyxl>=2.6.0', 'pandas', 'pyyaml', 'tabulate', 'xlrd', 'xlwt',
+            'zstandard',
+        ],
         'cli': ['tabulate'],
         'html': ['markuppy'],
         'ods': ['odfpy'],
@@ -46,5 +49,6 @@ setup(
         'xls': ['xlrd', 'xlwt'],
         'xlsx': ['openpyxl>=2.6.0'],
         'yaml': ['pyyaml'],
+        'zstd': ['zstandard'],
     },
 )
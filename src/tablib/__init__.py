@@ -1,18 +1,33 @@
 """ Tablib. """
-from pkg_resources import DistributionNotFound, get_distribution
 from tablib.core import (  # noqa: F401
     Databook,
     Dataset,
     InvalidDatasetType,
     InvalidDimensions,
     UnsupportedFormat,
+    concat,
+    concat_cols,
     detect_format,
     import_book,
     import_set,
 )
 
+from tablib.expressions import col  # noqa: F401
+from tablib.storage import DiskStorage  # noqa: F401
+from tablib.streaming import external_sort  # noqa: F401
+
+try:
+    # importlib.metadata is much cheaper to import than pkg_resources.
+    from importlib.metadata import PackageNotFoundError, version
+except ImportError:  # Python < 3.8
+    from pkg_resources import DistributionNotFound as PackageNotFoundError
+    from pkg_resources import get_distribution
+
+    def version(distribution_name):
+        return get_distribution(distribution_name).version
+
 try:
-    __version__ = get_distribution(__name__).version
-except DistributionNotFound:
+    __version__ = version(__name__)
+except PackageNotFoundError:
     # package is not installed
     __version__ = None
@@ -8,10 +8,18 @@
     :license: MIT, see LICENSE for more details.
 """
 
-from collections import OrderedDict
-from copy import copy
+import io
+import os
+import sys
+from array import array
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from functools import lru_cache, partial
+from hashlib import sha1
+from itertools import chain, islice
 from operator import itemgetter
 
+from tablib import hooks
 from tablib.exceptions import (
     HeadersNeeded,
     InvalidDatasetIndex,
@@ -19,8 +27,10 @@ from tablib.exceptions import (
     InvalidDimensions,
     UnsupportedFormat,
 )
+from tablib.expressions import Expression
 from tablib.formats import registry
-from tablib.utils import normalize_input
+from tablib.storage import get_storage
+from tablib.utils import decompress_input, normalize_input, text_stream
 
 __title__ = 'tablib'
 __author__ = 'Kenneth Reitz'
@@ -28,84 +38,97 @@ __license__ = 'MIT'
 __copyright__ = 'Copyright 2017 Kenneth Reitz. 2019 Jazzband.'
 __docformat__ = 'restructuredtext'
 
+# Plain dicts only keep insertion order from Python 3.7.
+_ordered_dict = dict if sys.version_info >= (3, 7) else OrderedDict
 
-class Row:
-    """Internal Row object. Mainly used for filtering."""
 
-    __slots__ = ['_row', 'tags']
+# Tags of the rows without tags, shared to save a list per row.
+_NO_TAGS = ()
 
-    def __init__(self, row=list(), tags=list()):
-        self._row = list(row)
-        self.tags = list(tags)
 
-    def __iter__(self):
-        # pythonlibrary.net: __iter__ 方法是用来支持 "for x in row"这样的语法的
-        return (col for col in self._row)
+def _intern_tags(tags):
+    """Returns the list of `tags`, string tags being interned so that rows
+    sharing a tag share a single string."""
+    return [sys.intern(tag) if type(tag) is str else tag for tag in tags]
 
-    def __len__(self):
-        # pythonlibrary.net: __len__ 方法是用来支持"len(row)"这样的语法的
-        return len(self._row)
+
+class _Pending:
+    """Value of the cells of lazily computed columns which are not computed
+    yet. There is a single instance, `_PENDING`."""
+
+    __slots__ = ()
 
     def __repr__(self):
-        # pythonlibrary.net: __repr__ 方法用来支持调试器
-        # 1. 如果使用调试器观察row对象的话，可以同时显示这里的信息
-        # 2. 如果一个类没没有定义__str__方法，那么__repr__会被用来替代__str__方法，而__str__方法的作用是
-        #    当使用print(row)来打印row对象的时候，会打印出__str__方法的返回内容
-        return repr(self._row)
+        return '<pending>'
 
-    def __getitem__(self, i):
-        # pythonlibrary.net: __getitem__ 方法用来支持通过[]操作符来获取对象中的元素，例如"var = row[1]"
-        return self._row[i]
+    def __reduce__(self):
+        # Pickled by reference, so that disk storage keeps it unique.
+        return '_PENDING'
 
-    def __setitem__(self, i, value):
-        # pythonlibrary.net: __setitem__ 方法用来支持通过[]操作符来修改对象中的元素，例如"row[1] = 1234"
-        self._row[i] = value
 
-    def __delitem__(self, i):
-        # pythonlibrary.net: __delitem__ 方法用来支持通过del来删除[]操作符选中的元素, 例如 "del row[1]"
-        del self._row[i]
+_PENDING = _Pending()
 
-    def __getstate__(self):
-        # pythonlibrary.net:  __getstate__ 和 __setstate__ 方法用来支持 pickle 库
+# A lazily computed column of a Dataset, see Dataset.insert_col.
+_LazyColumn = namedtuple('_LazyColumn', ['position', 'func', 'executor'])
+
+# Result of Dataset.diff.
+_Diff = namedtuple('Diff', ['added', 'removed', 'changed'])
 
-        slots = dict()
 
-        for slot in self.__slots__:
-            attribute = getattr(self, slot)
-            slots[slot] = attribute
+class Row(list):
+    """Internal Row object. Mainly used for filtering.
+
+    A row is the list of its values, with a ``tags`` attribute. Rows without
+    tags all share the same empty tuple, so that an untagged row costs a
+    single object, and string tags are interned.
+    """
+
+    # pythonlibrary.net:
+    # Row 直接继承 list，行的值就保存在 list 本身，不再额外创建一个 _row 列表
+    # 没有标签的行共享同一个空元组，因此每一行只需要一个对象
+    __slots__ = ['tags']
+
+    def __init__(self, row=(), tags=()):
+        super().__init__(row)
+        self.tags = _intern_tags(tags) if tags else _NO_TAGS
+
+    @property
+    def _row(self):
+        # Compatibility with the former `_row` list attribute.
+        return self
 
-        return slots
+    def __getstate__(self):
+        # pythonlibrary.net:  __getstate__ 和 __setstate__ 方法用来支持 pickle 库
+        return {'_row': list(self), 'tags': self.tags}
 
     def __setstate__(self, state):
         # pythonlibrary.net:  __getstate__ 和 __setstate__ 方法用来支持 pickle 库
         for (k, v) in list(state.items()):
-            setattr(self, k, v)
+            if k == '_row':
+                self[:] = v
+            else:
+                setattr(self, k, v)
+
+    def __reduce__(self):
+        # Rebuilt from its values and tags. Pickles made with __getstate__
+        # still load through __setstate__.
+        return (Row, (list(self), self.tags))
 
     def rpush(self, value):
-        self.insert(len(self._row), value)
+        self.insert(len(self), value)
 
     def lpush(self, value):
         self.insert(0, value)
 
-    def append(self, value):
-        self.rpush(value)
-
-    def insert(self, index, value):
-        self._row.insert(index, value)
-
-    def __contains__(self, item):
-        # pythonlibrary.net: __contains__ 方法支持 "if item in row" 的语法
-        return (item in self._row)
-
     @property
     def tuple(self):
         """Tuple representation of :class:`Row`."""
-        return tuple(self._row)
+        return tuple(self)
 
     @property
     def list(self):
         """List representation of :class:`Row`."""
-        return list(self._row)
+        return list(self)
 
     def has_tag(self, tag):
         """Returns true if current row contains tag."""
@@ -115,7 +138,7 @@ class Row:
         elif isinstance(tag, str):
             return (tag in self.tags)
         else:
-            return bool(len(set(tag) & set(self.tags)))
+            return any(t in self.tags for t in tag)
 
 
 class Dataset:
@@ -155,6 +178,18 @@ class Dataset:
     :param \\*args: (optional) list of rows to populate Dataset
     :param headers: (optional) list strings for Dataset header row
     :param title: (optional) string to use as title of the Dataset
+    :param storage: (optional) ``'memory'`` (the default) to keep the rows in
+                    a list, ``'deque'`` to push and pop rows at both ends in
+                    constant time, or ``'disk'`` or a
+                    :class:`~tablib.DiskStorage` to keep them on disk with a
+                    bounded number of rows in memory.
+                    Datasets derived from this one use the same storage.
+    :param export_cache: (optional) number of export outputs to keep, the
+                         least recently used being dropped first. An export
+                         is then only serialized again once the
+                         :class:`Dataset` has changed, see
+                         :attr:`Dataset.version`. Formatters must return the
+                         same values for the same rows.
 
 
     .. admonition:: Format Attributes Definition
@@ -165,8 +200,43 @@ class Dataset:
 
     """
 
+    # (rows list, height, {tag: array of row positions}) built on first
+    # filter, and only kept up to date by appends.
+    _tag_index = None
+
+    # Builds the row store from an iterable of rows.
+    _storage = list
+
+    # (headers list, its length, {header: position}), see _header_positions.
+    _header_map = None
+
+    # Whether the row store, or the rows in it, are shared with another
+    # Dataset and must be copied before being modified in place.
+    _shared_data = False
+    _shared_rows = False
+
+    # Lazily computed columns in the order they were added, and whether some
+    # of their cells are _PENDING.
+    _lazy_cols = ()
+    _pending = False
+
+    # Number of changes, see Dataset.version, and the export outputs cache.
+    _version = 0
+    _appends = 0
+    _export_cache = None
+    _export_cache_size = 0
+
+    # {format: (rows written, changes other than appends, headers)} of
+    # export_incremental.
+    _incremental = None
+
     def __init__(self, *args, **kwargs):
-        self._data = list(Row(arg) for arg in args)
+        if kwargs.get('storage') is not None:
+            self._storage = get_storage(kwargs['storage'])
+        if kwargs.get('export_cache'):
+            self._export_cache_size = kwargs['export_cache']
+            self._export_cache = OrderedDict()
+        self._data = self._storage(Row(arg) for arg in args)
         self.__headers = None
 
         # ('title', index) tuples
@@ -183,15 +253,19 @@ class Dataset:
         # pythonlibrary.net: self.height 是下边定义的一个property
         return self.height
 
+    def __iter__(self):
+        # pythonlibrary.net:
+        # 没有__iter__的时候，for循环会退回到用__getitem__逐个索引直到IndexError
+        self._resolve()
+        return map(tuple, self._data)
+
     def __getitem__(self, key):
+        self._resolve()
         if isinstance(key, str):
             # pythonlibrary.net:
             # 如果key是一个字符串，则检查key是不是在self.headers中出现，如果出现了，就返回那一列的内容
-            if key in self.headers:
-                pos = self.headers.index(key)  # get 'key' index from each data
-                return [row[pos] for row in self._data]
-            else:
-                raise KeyError
+            pos = self._col_index(key)  # get 'key' index from each data
+            return [row[pos] for row in self._data]
         else:
             # pythonlibrary.net:
             # 如果key不是一个字符串，则它有可能是一个数字或者是一个切片操作
@@ -212,29 +286,39 @@ class Dataset:
         # 这个方法用来支持使用[]操作符设置元素，类似于dataset[1] = xxxx的操作，可以用来修改某一行的值
         # 因此我们要先检查输入值得有效性
         # 它跟__getitem__方法不同，__getitem__方法支持通过标题来获取列数据，而__setitem__方法仅支持修改行
+        value = self._with_pending_cells(value)
         self._validate(value)
+        self._own_data()
+        self._version += 1
         # pythonlibrary.net: 如果输入的值有效，则修改指定行的内容 
         self._data[key] = Row(value)
+        self._tag_index = None
 
     def __delitem__(self, key):
         # pythonlibrary.net: 
         # 跟__getitem__方法类似, 我们可以通过[]操作符来删除某一行或者某一列
         if isinstance(key, str):
 
-            if key in self.headers:
-
-                pos = self.headers.index(key)
-                del self.headers[pos]
+            pos = self._col_index(key)
+            self._version += 1
+            del self.headers[pos]
+            self._header_map = None
+            self._lazy_cols = [
+                lazy._replace(position=lazy.position - (lazy.position > pos))
+                for lazy in self._lazy_cols if lazy.position != pos
+            ]
 
-                for i, row in enumerate(self._data):
-                    # pythonlibrary.net: 
-                    # 因为Dataset中的数据是按行保存的，当我们要删除某一列的时候，需要循环删除每一行中的对应列
-                    del row[pos]
-                    self._data[i] = row
-            else:
-                raise KeyError
+            self._own_rows()
+            for i, row in enumerate(self._data):
+                # pythonlibrary.net: 
+                # 因为Dataset中的数据是按行保存的，当我们要删除某一列的时候，需要循环删除每一行中的对应列
+                del row[pos]
+                self._data[i] = row
         else:
+            self._own_data()
             del self._data[key]
+            self._tag_index = None
+            self._version += 1
 
     def __repr__(self):
         # pythonlibrary.net: 
@@ -257,6 +341,7 @@ class Dataset:
         # Add str representation of rows.
         # pythonlibrary.net: 
         # map函数将会把row里边的每一个元素作为参数传递给str()函数，最终每一行会变成一个字符串list被添加到result列表中
+        self._resolve()
         result.extend(list(map(str, row)) for row in self._data)
 
         # pythonlibrary.net
@@ -285,14 +370,14 @@ class Dataset:
     def _get_in_format(self, fmt_key, **kwargs):
         # pythonlibrary.net: 
         # 调用了format类的export_set方法，其具体实现要看不同的format类
-        return registry.get_format(fmt_key).export_set(self, **kwargs)
+        return self.export(fmt_key, **kwargs)
 
     def _set_in_format(self, fmt_key, in_stream, **kwargs):
         # pythonlibrary.net: 
         # 调用了format类的import_set方法，其具体实现要看不同的format类
-        in_stream = normalize_input(in_stream)
-        return registry.get_format(fmt_key).import_set(self, in_stream, **kwargs)
+        self.load(in_stream, fmt_key, **kwargs)
 
+    @hooks.timed('validate')
     def _validate(self, row=None, col=None, safety=False):
         """Assures size of every row in dataset is of proper proportions."""
         # pythonlibrary.net: 
@@ -326,35 +411,19 @@ class Dataset:
                 raise InvalidDimensions
             return False
 
+    @hooks.timed('package')
     def _package(self, dicts=True, ordered=True):
         """Packages Dataset into lists of dictionaries for transmission."""
         # TODO: Dicts default to false?
 
-        _data = list(self._data)
+        self._resolve()
+        _data = self._format_rows(self._data)
 
         if ordered:
             dict_pack = OrderedDict
         else:
             dict_pack = dict
 
-        # Execute formatters
-        if self._formatters:
-            for row_i, row in enumerate(_data):
-                for col, callback in self._formatters:
-                    try:
-                        if col is None:
-                            for j, c in enumerate(row):
-                                # pythonlibrary.net: 
-                                # 如果没有提供列名，则针对该每一行的所有元素进行格式化
-                                # callback就是格式化回调函数
-                                _data[row_i][j] = callback(c)
-                        else:
-                                # pythonlibrary.net: 
-                                # 如果提供了列名，那么只用callback来格式化给定列的元素
-                            _data[row_i][col] = callback(row[col])
-                    except IndexError:
-                        raise InvalidDatasetIndex
-
         if self.headers:
             if dicts:
                 # pythonlibrary.net: When dicts is enabled, that means we want to package data to dicts
@@ -370,6 +439,166 @@ class Dataset:
 
         return data
 
+    def _format_rows(self, rows):
+        """Returns the list of `rows`, copied and formatted if the
+        :class:`Dataset` has formatters."""
+        if not self._formatters:
+            return list(rows)
+        return list(self._iter_formatted(rows))
+
+    def _iter_formatted(self, rows):
+        """Yields `rows` one at a time, copied and formatted if the
+        :class:`Dataset` has formatters."""
+        if not self._formatters:
+            yield from rows
+            return
+
+        for row in rows:
+            # Formatters work on copies, the rows may be shared with other datasets.
+            row = list(row)
+
+            # Execute formatters
+            for col, callback in self._formatters:
+                try:
+                    if col is None:
+                        for j, c in enumerate(row):
+                            # pythonlibrary.net: 
+                            # 如果没有提供列名，则针对该每一行的所有元素进行格式化
+                            # callback就是格式化回调函数
+                            row[j] = callback(c)
+                    else:
+                            # pythonlibrary.net: 
+                            # 如果提供了列名，那么只用callback来格式化给定列的元素
+                        row[col] = callback(row[col])
+                except IndexError:
+                    raise InvalidDatasetIndex
+            yield row
+
+    def _export_rows(self):
+        """Returns the formatted rows to export, without the header row.
+
+        Rows held in a list are packaged by :meth:`_package`. Rows of other
+        stores are formatted one at a time as they are read, so that
+        exporting a disk backed :class:`Dataset` does not load it in memory.
+        """
+        if type(self._data) is list:
+            data = self._package(dicts=False)
+            return data[1:] if self.headers else data
+        self._resolve()
+        return self._iter_formatted(self._data)
+
+    def _header_positions(self):
+        """Returns a dict mapping each header to its (first) position.
+
+        It is kept with a snapshot of the headers and rebuilt when they
+        differ, including when headers are renamed in place in the list.
+        """
+        headers = self.__headers
+        cache = self._header_map
+        if cache is None or cache[0] != headers:
+            positions = {}
+            for i, header in enumerate(headers or ()):
+                positions.setdefault(header, i)
+            snapshot = list(headers) if headers is not None else None
+            cache = self._header_map = (snapshot, positions)
+        return cache[1]
+
+    def _col_index(self, col):
+        """Returns the index of `col`, given as a header or an index."""
+        if isinstance(col, str):
+            try:
+                return self._header_positions()[col]
+            except KeyError:
+                raise KeyError(col)
+        return col
+
+    def _load_rows(self, rows, headers=None):
+        """Replaces the content with `rows` in bulk. Rows are trusted to be of
+        the same width as `headers`, so they are not validated one by one."""
+        self._data = self._storage(Row(row) for row in rows)
+        self.__headers = list(headers) if headers else None
+        self._header_map = None
+        self._tag_index = None
+        self._version += 1
+        self._shared_data = self._shared_rows = False
+        self._lazy_cols, self._pending = (), False
+
+    def _derive(self, data):
+        """Returns a new instance of the :class:`Dataset` holding the row store
+        `data`, with the headers, title, separators and formatters of this
+        one. The rows of `data` are shared with this Dataset."""
+        _dset = self.__class__.__new__(self.__class__)
+        _dset.__dict__.update(self.__dict__)
+        _dset._data = data
+        if self.__headers is not None:
+            _dset.__headers = list(self.__headers)
+        _dset._separators = list(self._separators)
+        _dset._formatters = list(self._formatters)
+        _dset._header_map = None
+        _dset._tag_index = None
+        _dset._shared_data = False
+        _dset._shared_rows = self._shared_rows = True
+        if self._export_cache is not None:
+            _dset._export_cache = OrderedDict()
+        _dset._incremental = None
+        return _dset
+
+    def _own_data(self):
+        """Copies the row store before it is changed, if it is shared with a
+        copy. The rows themselves stay shared."""
+        if self._shared_data:
+            self._data = self._storage(self._data)
+            self._shared_data = False
+
+    def _own_rows(self):
+        """Copies the rows before they are changed in place, if they are
+        shared with another Dataset."""
+        if self._shared_rows:
+            self._data = self._storage(Row(row, row.tags) for row in self._data)
+            self._shared_data = self._shared_rows = False
+
+    def _resolve(self):
+        """Computes the pending cells of lazily computed columns, column by
+        column in the order they were added. Each callable receives the row
+        without its column and the lazily computed columns added after it."""
+        if not self._pending:
+            return
+
+        self._own_rows()
+        width = self.width
+        for k, (pos, func, executor) in enumerate(self._lazy_cols):
+            indexes = [i for i, row in enumerate(self._data) if row[pos] is _PENDING]
+            if not indexes:
+                continue
+            hidden = {pos}.union(lazy.position for lazy in self._lazy_cols[k + 1:])
+            get_values = _tuple_getter([j for j in range(width) if j not in hidden])
+            sources = [Row(get_values(self._data[i]), self._data[i].tags) for i in indexes]
+            values = executor.map(func, sources) if executor is not None else map(func, sources)
+            for i, value in zip(indexes, values):
+                row = self._data[i]
+                row[pos] = value
+                self._data[i] = row
+        self._pending = False
+
+    def _with_pending_cells(self, row):
+        """Returns `row` with its cells of lazily computed columns pending, so
+        that they are computed from the new row. These cells may also be
+        left out of `row`."""
+        if not self._lazy_cols:
+            return row
+
+        row = list(row)
+        positions = sorted(lazy.position for lazy in self._lazy_cols)
+        if len(row) == self.width - len(positions):
+            for pos in positions:
+                row.insert(pos, _PENDING)
+        else:
+            for pos in positions:
+                if pos < len(row):
+                    row[pos] = _PENDING
+        self._pending = True
+        return row
+
     def _get_headers(self):
         """An *optional* list of strings to be used for header rows and attribute names.
 
@@ -384,6 +613,8 @@ class Dataset:
         # 因为在调用_validate方法的时候选择了non-saftey方式，因此如果格式不正确会抛出异常，所以
         # 这里不需要判断该方法的返回值
         self._validate(collection)
+        self._header_map = None
+        self._version += 1
         if collection:
             try:
                 self.__headers = list(collection)
@@ -474,6 +705,14 @@ class Dataset:
         """
         return len(self._data)
 
+    @property
+    def version(self):
+        """The number of changes made to the :class:`Dataset`, increased by
+        every method changing its rows, columns, headers, separators or
+        formatters. Cannot be directly modified.
+        """
+        return self._version
+
     @property
     def width(self):
         """The number of columns currently in the :class:`Dataset`.
@@ -498,21 +737,29 @@ class Dataset:
         :param \\*\\*kwargs: (optional) custom configuration to the format `import_set`.
         """
 
-        stream = normalize_input(in_stream)
-        if not format:
-            # pythonlibrary.net: 
-            # 如果没有提供格式，则尝试自动检测
-            format = detect_format(stream)
+        with hooks.event('load', 'dataset', format) as event:
+            raw = normalize_input(in_stream)
+            stream, compression = decompress_input(raw)
+            if not format:
+                # pythonlibrary.net: 
+                # 如果没有提供格式，则尝试自动检测
+                format = detect_format(stream)
 
-        fmt = registry.get_format(format)
-        if not hasattr(fmt, 'import_set'):
-            raise UnsupportedFormat('Format {} cannot be imported.'.format(format))
+            fmt = registry.get_format(format)
+            if not hasattr(fmt, 'import_set'):
+                raise UnsupportedFormat('Format {} cannot be imported.'.format(format))
+
+            if not import_set:
+                # support to pass in the custom import_set function
+                raise UnsupportedFormat('Format {} cannot be imported.'.format(format))
 
-        if not import_set:
-            # support to pass in the custom import_set function
-            raise UnsupportedFormat('Format {} cannot be imported.'.format(format))
+            with hooks.phase('parse'), _format_input(format, stream, compression) as stream:
+                fmt.import_set(self, stream, **kwargs)
 
-        fmt.import_set(self, stream, **kwargs)
+            if event is not None:
+                event.format = format
+                event.rows, event.cols = self.height, self.width
+                event.size = hooks.size_of(in_stream if isinstance(in_stream, (str, bytes)) else raw)
         return self
 
     def export(self, format, **kwargs):
@@ -522,11 +769,100 @@ class Dataset:
         :param \\*\\*kwargs: (optional) custom configuration to the format `export_set`.
         """
 
+        with hooks.event('export', 'dataset', format) as event:
+            fmt = registry.get_format(format)
+            if not hasattr(fmt, 'export_set'):
+                raise UnsupportedFormat('Format {} cannot be exported.'.format(format))
+
+            key = self._export_key(format, kwargs)
+            result = self._export_cache.get(key) if key is not None else None
+            if result is None:
+                with hooks.phase('serialize'):
+                    result = fmt.export_set(self, **kwargs)
+                if key is not None and isinstance(result, (str, bytes)):
+                    # Other outputs, like data frames, could be changed by
+                    # the caller.
+                    self._export_cache[key] = result
+                    while len(self._export_cache) > self._export_cache_size:
+                        self._export_cache.popitem(last=False)
+            else:
+                self._export_cache.move_to_end(key)
+
+            if event is not None:
+                event.rows, event.cols = self.height, self.width
+                event.size = hooks.size_of(result)
+        return result
+
+    def export_incremental(self, fileobj, format, restart=False, **kwargs):
+        """Writes to `fileobj` the rows appended since the last call for the
+        same `format`, after the headers on the first call, so that writing
+        out a growing :class:`Dataset` takes time proportional to the new
+        rows. Returns the number of rows written. ::
+
+            with open('collected.csv', 'a', newline='') as fh:
+                data.export_incremental(fh, 'csv')
+
+        Supported formats are those written row by row: ``csv``, ``tsv`` and
+        ``jsonl``. Raises ValueError if, since the last call, rows were
+        changed or removed, rows were inserted before the end, or the
+        headers changed, as the rows already written would not match.
+
+        :param fileobj: text file-like object, or binary one receiving UTF-8.
+        :param restart: write all the rows again, after the headers.
+        :param \\*\\*kwargs: (optional) custom configuration to the format
+                            ``write_rows``.
+        """
         fmt = registry.get_format(format)
-        if not hasattr(fmt, 'export_set'):
-            raise UnsupportedFormat('Format {} cannot be exported.'.format(format))
-
-        return fmt.export_set(self, **kwargs)
+        if not hasattr(fmt, 'write_rows'):
+            raise UnsupportedFormat('Format {} cannot be exported incrementally.'.format(format))
+
+        with hooks.event('export', 'dataset', format) as event:
+            self._resolve()
+            headers = tuple(self.headers) if self.headers else None
+            edits = self._version - self._appends
+            if self._incremental is None:
+                self._incremental = {}
+            state = None if restart else self._incremental.get(format)
+            if state is None:
+                offset = 0
+            elif state[1:] != (edits, headers):
+                raise ValueError(
+                    'Rows other than appended ones, or headers, changed since the '
+                    'last incremental export, use restart=True to write them again.'
+                )
+            else:
+                offset = state[0]
+
+            count = len(self._data) - offset
+            rows = self._iter_formatted(_rows_from(self._data, offset))
+            # Rows keyed by headers need them every time, a header row once.
+            row_headers = headers if offset == 0 or getattr(fmt, 'keyed_rows', False) else None
+            with hooks.phase('serialize'):
+                if isinstance(fileobj, (io.RawIOBase, io.BufferedIOBase)):
+                    text = io.TextIOWrapper(fileobj, encoding='utf-8', newline='')
+                    fmt.write_rows(text, rows, headers=row_headers, **kwargs)
+                    text.flush()
+                    text.detach()
+                else:
+                    fmt.write_rows(fileobj, rows, headers=row_headers, **kwargs)
+
+            self._incremental[format] = (offset + count, edits, headers)
+            if event is not None:
+                event.rows, event.cols = count, self.width
+        return count
+
+    def _export_key(self, format, kwargs):
+        """Returns the key of an export in the export cache, or None if it
+        cannot be cached."""
+        if self._export_cache is None:
+            return None
+        key = (format, tuple(sorted(kwargs.items())), self._version, self.title,
+               tuple(self.headers) if self.headers else None)
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
 
     # ----
     # Rows
@@ -541,9 +877,26 @@ class Dataset:
         object at the given index.
        """
 
+        row = self._with_pending_cells(row)
         self._validate(row)
+        self._own_data()
+        self._version += 1
+        appending = index >= len(self._data)
+        if appending:
+            self._appends += 1
         self._data.insert(index, Row(row, tags=tags))
 
+        if self._tag_index is not None:
+            if appending and self._tag_index_is_valid(offset=1):
+                # Appended rows are indexed as they come, any other insert
+                # shifts the following positions so the index is rebuilt.
+                data, height, positions = self._tag_index
+                for tag in set(tags):
+                    positions.setdefault(tag, array('q')).append(height)
+                self._tag_index = (data, height + 1, positions)
+            else:
+                self._tag_index = None
+
     def rpush(self, row, tags=list()):
         """Adds a row to the end of the :class:`Dataset`.
         See :class:`Dataset.insert` for additional documentation.
@@ -576,29 +929,81 @@ class Dataset:
     def lpop(self):
         """Removes and returns the first row of the :class:`Dataset`."""
 
-        cache = self[0]
-        del self[0]
+        self._resolve()
+        self._own_data()
+        row = self._data.pop(0)
+        self._version += 1
+        self._tag_index = None
 
-        return cache
+        return row.tuple
 
     def rpop(self):
         """Removes and returns the last row of the :class:`Dataset`."""
 
-        cache = self[-1]
-        del self[-1]
+        self._resolve()
+        self._own_data()
+        row = self._data.pop()
+        self._version += 1
+        self._tag_index = None
 
-        return cache
+        return row.tuple
 
     def pop(self):
         """Removes and returns the last row of the :class:`Dataset`."""
 
         return self.rpop()
 
+    def iter_rows(self, as_='tuple', cols=None):
+        """Returns an iterator over the rows of the :class:`Dataset`. ::
+
+            for name, total in data.iter_rows(cols=['name', 'total']):
+                ...
+
+        :param as_: type of the rows: ``'tuple'``, ``'list'``, ``'dict'``
+                    (keyed by header), ``'namedtuple'`` (with the headers as
+                    field names, invalid names being replaced by ``_0``,
+                    ``_1``...) or ``'row'``.
+        :param cols: (optional) list of columns, as headers or indexes, to
+                     include in each row. Defaults to all columns.
+
+        Rows are built straight from the row values, columns being picked with
+        a single :func:`operator.itemgetter`. With ``as_='row'``, the stored
+        :class:`Row` objects are yielded without any copy, for read-only
+        access: they must not be changed, and `cols` cannot be given.
+        """
+        if as_ not in ('tuple', 'list', 'dict', 'namedtuple', 'row'):
+            raise ValueError("as_ must be 'tuple', 'list', 'dict', 'namedtuple' or 'row', not %r" % (as_,))
+        if as_ in ('dict', 'namedtuple') and not self.headers:
+            raise HeadersNeeded
+        if as_ == 'row' and cols is not None:
+            raise ValueError("cols cannot be given with as_='row'")
+
+        self._resolve()
+        if as_ == 'row':
+            return iter(self._data)
+        values = iter(self._data)
+        if cols is None:
+            headers = self.headers
+            if as_ == 'tuple':
+                values = map(tuple, values)
+        else:
+            positions = [self._col_index(col) for col in cols]
+            headers = [self.headers[pos] for pos in positions] if self.headers else None
+            values = map(_tuple_getter(positions), values)
+
+        if as_ == 'list':
+            return map(list, values)
+        if as_ == 'dict':
+            return (_ordered_dict(zip(headers, row)) for row in values)
+        if as_ == 'namedtuple':
+            return map(_record_type(tuple(headers))._make, values)
+        return values
+
     # -------
     # Columns
     # -------
 
-    def insert_col(self, index, col=None, header=None):
+    def insert_col(self, index, col=None, header=None, lazy=False, executor=None):
         """Inserts a column to the :class:`Dataset` at the given index.
 
         Columns inserted must be the correct height.
@@ -609,6 +1014,17 @@ class Dataset:
 
             data.append_col(col=random.randint)
 
+        With ``lazy=True``, the callable is only called when the column is
+        first read or exported, and its values are kept: only the rows
+        added or replaced since are computed again. It receives the row
+        without the lazy columns added after it. Selecting or dropping
+        other columns does not compute it. Rows added later may leave the
+        column out.
+
+        :param executor: (optional) :class:`concurrent.futures.Executor`,
+                         e.g. a thread or process pool, whose ``map`` calls
+                         the callable on the rows.
+
         If inserting a column, and :class:`Dataset.headers` is set, the
         header attribute must be set, and will be considered the header for
         that row.
@@ -630,16 +1046,29 @@ class Dataset:
         if col is None:
             col = []
 
+        width = self.width
+        position = min(max(index + width, 0) if index < 0 else index, width)
+        lazy_col = None
+
         # Callable Columns...
-        if hasattr(col, '__call__'):
+        if lazy:
+            if not callable(col):
+                raise TypeError('Lazy columns are computed by a callable.')
+            # pythonlibrary.net:
+            # 惰性列先用_PENDING占位，读取或导出时才由_resolve计算
+            lazy_col = _LazyColumn(position, col, executor)
+            col = [_PENDING] * self.height
+        elif hasattr(col, '__call__'):
             # pythonlibrary.net: 
             # 动态列，动态列使用的函数仅支持Row作为参数
-            col = list(map(col, self._data))
+            self._resolve()
+            col = list((executor.map if executor is not None else map)(col, self._data))
 
         # pythonlibrary.net: 
         # 传统列和动态列都经过_clean_col处理成传统数字格式的列
         col = self._clean_col(col)
         self._validate(col=col)
+        self._version += 1
 
         if self.headers:
             # pop the first item off, add to headers
@@ -656,11 +1085,13 @@ class Dataset:
                 raise InvalidDimensions
 
             self.headers.insert(index, header)
+            self._header_map = None
 
         if self.height and self.width:
             # pythonlibrary.net: 
             # dataset里边有数据
 
+            self._own_rows()
             for i, row in enumerate(self._data):
                 # pythonlibrary.net: 
                 # 向每一行中增加列元素
@@ -670,27 +1101,37 @@ class Dataset:
         else:
             # pythonlibrary.net: 
             # 如果dataset里边没有数据，则用给定的元素创建每一行的Row对象
-            self._data = [Row([row]) for row in col]
-
-    def rpush_col(self, col, header=None):
+            self._data = self._storage(Row([row]) for row in col)
+            self._shared_data = self._shared_rows = False
+
+        self._lazy_cols = [
+            lazy._replace(position=lazy.position + (lazy.position >= position))
+            for lazy in self._lazy_cols
+        ]
+        if lazy_col is not None:
+            self._lazy_cols.append(lazy_col)
+            self._pending = self._pending or bool(col)
+
+    def rpush_col(self, col, header=None, lazy=False, executor=None):
         """Adds a column to the end of the :class:`Dataset`.
         See :class:`Dataset.insert` for additional documentation.
         """
 
-        self.insert_col(self.width, col, header=header)
+        self.insert_col(self.width, col, header=header, lazy=lazy, executor=executor)
 
-    def lpush_col(self, col, header=None):
+    def lpush_col(self, col, header=None, lazy=False, executor=None):
         """Adds a column to the top of the :class:`Dataset`.
         See :class:`Dataset.insert` for additional documentation.
         """
 
-        self.insert_col(0, col, header=header)
+        self.insert_col(0, col, header=header, lazy=lazy, executor=executor)
 
     def insert_separator(self, index, text='-'):
         """Adds a separator to :class:`Dataset` at given index."""
 
         sep = (index, text)
         self._separators.append(sep)
+        self._version += 1
 
     def append_separator(self, text='-'):
         """Adds a :ref:`separator <separators>` to the :class:`Dataset`."""
@@ -705,22 +1146,79 @@ class Dataset:
 
         self.insert_separator(index, text)
 
-    def append_col(self, col, header=None):
+    def append_col(self, col, header=None, lazy=False, executor=None):
         """Adds a column to the :class:`Dataset`.
         See :class:`Dataset.insert_col` for additional documentation.
         """
 
-        self.rpush_col(col, header)
+        self.rpush_col(col, header, lazy=lazy, executor=executor)
 
     def get_col(self, index):
         """Returns the column from the :class:`Dataset` at the given index."""
 
+        self._resolve()
         return [row[index] for row in self._data]
 
+    def map_col(self, col, func, workers=None, executor='thread', chunksize=None):
+        """Replaces the values of a column, given as a header or an index, by
+        the results of `func` called on each of them in a pool of workers. ::
+
+            data.map_col('address', geocode, workers=8)
+
+        Values are sent to the workers in chunks, and the results are written
+        back in order, so that they are the same as with a serial loop.
+
+        :param workers: (optional) number of workers. Defaults to the number
+                        of CPUs. With 1 worker, `func` is called in the
+                        current thread.
+        :param executor: ``'thread'`` or ``'process'`` for a pool of
+                         `workers` threads or processes, or a
+                         :class:`concurrent.futures.Executor` to use. With
+                         processes, `func` and the values must be picklable.
+        :param chunksize: (optional) number of values per task. Defaults to
+                          four tasks per worker.
+        """
+        pos = self._col_index(col)
+        width = self.width
+        if not -width <= pos < width:
+            raise InvalidDatasetIndex
+        pos %= width
+
+        self._resolve()
+        values = [row[pos] for row in self._data]
+        results = _map_chunks(func, values, workers, executor, chunksize)
+
+        # The mapped values are not computed again from their rows, the
+        # other lazily computed columns are, as their rows changed.
+        self._lazy_cols = [lazy for lazy in self._lazy_cols if lazy.position != pos]
+        stale = [lazy.position for lazy in self._lazy_cols]
+
+        self._own_rows()
+        self._version += 1
+        for i, (row, value) in enumerate(zip(self._data, results)):
+            row[pos] = value
+            for j in stale:
+                row[j] = _PENDING
+            self._data[i] = row
+        if stale and self._data:
+            self._pending = True
+
     # ----
     # Misc
     # ----
 
+    def copy(self):
+        """Returns a copy of the :class:`Dataset`, which is cheap whatever
+        its size: both share their rows until either of them is changed.
+        Changing rows then copies the list of rows, and changing columns
+        copies the rows themselves, so that changes never show in the other
+        one. ``copy.copy(dataset)`` is the same."""
+        _dset = self._derive(self._data)
+        _dset._shared_data = self._shared_data = True
+        return _dset
+
+    __copy__ = copy
+
     def add_formatter(self, col, handler):
         """Adds a formatter to the :class:`Dataset`.
 
@@ -732,10 +1230,7 @@ class Dataset:
         """
 
         if isinstance(col, str):
-            if col in self.headers:
-                col = self.headers.index(col)  # get 'key' index from each data
-            else:
-                raise KeyError
+            col = self._col_index(col)  # get 'key' index from each data
 
         if not col > self.width:
             # pythonlibrary.net: 
@@ -744,6 +1239,7 @@ class Dataset:
             #     比如我们想把某一列的字符串全部大写，也就是改变那一列的格式，而formats文件夹中的
             #     格式指的是tablib支持什么样格式的文件
             self._formatters.append((col, handler))
+            self._version += 1
         else:
             raise InvalidDatasetIndex
 
@@ -755,10 +1251,53 @@ class Dataset:
         """
         # pythonlibrary.net: 
         # 使用tag来过滤dataset，因为我们要一个子dataset，所以需要先copy
-        _dset = copy(self)
-        _dset._data = [row for row in _dset._data if row.has_tag(tag)]
+        # 新的dataset与原dataset共享Row对象，修改前由_own_rows复制
+        return self._derive(self._storage(self._data[i] for i in self._tag_positions(tag)))
 
-        return _dset
+    def where(self, predicate):
+        """Returns a new instance of the :class:`Dataset`, excluding any rows
+        for which `predicate` is false. `predicate` is either a callable
+        receiving each row, or a column :class:`~tablib.expressions.Expression`
+        compiled once for the whole ``Dataset``. ::
+
+            from tablib import col
+
+            data.where((col('amount') > 100) & col('region').isin(['north']))
+        """
+        self._resolve()
+        if isinstance(predicate, Expression):
+            test = predicate.compile(self)
+            rows = (row for row in self._data if test(row))
+        else:
+            rows = (row for row in self._data if predicate(row))
+
+        return self._derive(self._storage(rows))
+
+    def _tag_index_is_valid(self, offset=0):
+        """Returns True if the tag index matches the rows, `offset` being the
+        number of rows added since it was last updated."""
+        return (
+            self._tag_index is not None and self._tag_index[0] is self._data
+            and self._tag_index[1] + offset == len(self._data)
+        )
+
+    def _tag_positions(self, tag):
+        """Returns the sorted positions of the rows having `tag`, or any of
+        the tags if given a list, using the tag index."""
+        if tag is None:
+            return []
+
+        if not self._tag_index_is_valid():
+            index = {}
+            for i, row in enumerate(self._data):
+                for t in set(row.tags):
+                    index.setdefault(t, array('q')).append(i)
+            self._tag_index = (self._data, len(self._data), index)
+        index = self._tag_index[2]
+
+        if isinstance(tag, str):
+            return index.get(tag, ())
+        return sorted(set().union(*(index.get(t, ()) for t in tag)))
 
     def sort(self, col, reverse=False):
         """Sort a :class:`Dataset` by a specific column, given string (for
@@ -784,7 +1323,7 @@ class Dataset:
             # 因此itemgetter(col)将将使用列名来通过self.dict获取元素值，然后对其排序
 
             _sorted = sorted(self.dict, key=itemgetter(col), reverse=reverse)
-            _dset = Dataset(headers=self.headers, title=self.title)
+            _dset = Dataset(headers=self.headers, title=self.title, storage=self._storage)
 
             for item in _sorted:
                 # as _sorted is a sorted dict from self.dict, so here we convert the dict back to dataset
@@ -797,7 +1336,7 @@ class Dataset:
                 col = self.headers[col]
 
             _sorted = sorted(self.dict, key=itemgetter(col), reverse=reverse)
-            _dset = Dataset(headers=self.headers, title=self.title)
+            _dset = Dataset(headers=self.headers, title=self.title, storage=self._storage)
 
             for item in _sorted:
                 if self.headers:
@@ -811,32 +1350,31 @@ class Dataset:
     def transpose(self):
         """Transpose a :class:`Dataset`, turning rows into columns and vice
         versa, returning a new ``Dataset`` instance. The first row of the
-        original instance becomes the new header row."""
+        original instance becomes the new header row. A :class:`Dataset`
+        without headers is transposed without headers.
+
+        Separators and tags refer to rows which do not exist anymore once
+        transposed, so they are not kept.
+        """
 
         # Don't transpose if there is no data
         if not self:
             return
 
-        _dset = Dataset()
-        # The first element of the headers stays in the headers,
-        # it is our "hinge" on which we rotate the data
-
-        # pythonlibrary.net: 
-        # 使用第一列（包含表头）作为新的表头
-        new_headers = [self.headers[0]] + self[self.headers[0]]
-
-        _dset.headers = new_headers
-        for index, column in enumerate(self.headers):
+        self._resolve()
+        _dset = Dataset(title=self.title, storage=self._storage)
+        rows = iter(self._data)
 
-            if column == self.headers[0]:
-                # It's in the headers, so skip it
-                continue
+        if self.headers:
+            # The first element of the headers stays in the headers,
+            # it is our "hinge" on which we rotate the data
+            columns = zip(self.headers, *rows)
+            new_headers = next(columns)
+        else:
+            columns = zip(*rows)
+            new_headers = None
 
-            # Adding the column name as now they're a regular column
-            # Use `get_col(index)` in case there are repeated values
-            row_data = [column] + self.get_col(index)
-            row_data = Row(row_data)
-            _dset.append(row=row_data)
+        _dset._load_rows(columns, headers=new_headers)
         return _dset
 
     def stack(self, other):
@@ -851,70 +1389,85 @@ class Dataset:
             raise InvalidDimensions
 
         # Copy the source data
-        _dset = copy(self)
-
-        rows_to_stack = [row for row in _dset._data]
-        other_rows = [row for row in other._data]
-
-        rows_to_stack.extend(other_rows)
-        _dset._data = rows_to_stack
-
-        return _dset
+        other._resolve()
+        other._shared_rows = True
+        return self._derive(self._storage(chain(self._data, other._data)))
 
     def stack_cols(self, other):
         """Stack two :class:`Dataset` instances together by
         joining at the column level, and return a new
         combined ``Dataset`` instance. If either ``Dataset``
-        has headers set, than the other must as well."""
+        has headers set, than the other must as well.
+        See :func:`concat_cols` to stack more than two datasets."""
 
         if not isinstance(other, Dataset):
             return
 
-        # pythonlibrary.net:
-        # 两个dataset都需要有表头
-        if self.headers or other.headers:
-            if not self.headers or not other.headers:
-                raise HeadersNeeded
-
-        # pythonlibrary.net: 
-        # 两个dataset的高度一致
-        if self.height != other.height:
-            raise InvalidDimensions
+        return concat_cols([self, other])
 
-        try:
-            new_headers = self.headers + other.headers
-        except TypeError:
-            new_headers = None
-
-        _dset = Dataset()
-
-        for column in self.headers:
-            _dset.append_col(col=self[column])
-
-        for column in other.headers:
-            _dset.append_col(col=other[column])
-
-        _dset.headers = new_headers
+    def remove_duplicates(self, subset=None, keep='first', fingerprint=False):
+        """Removes all duplicate rows from the :class:`Dataset` object
+        while maintaining the original order, and returns the number of
+        removed rows.
+
+        :param subset: (optional) columns, as headers or indexes, compared to
+                       find duplicates. Defaults to all columns.
+        :param keep: keep the ``'first'`` or the ``'last'`` of the duplicates.
+        :param fingerprint: remember a 64-bit digest of the ``repr`` of each
+                            row instead of the row values, which bounds the
+                            memory used on large datasets. Values are then
+                            compared by ``repr``, and a digest collision,
+                            however unlikely, drops a distinct row.
+        """
+        if keep not in ('first', 'last'):
+            raise ValueError("keep must be 'first' or 'last', not %r" % (keep,))
 
-        return _dset
+        if subset is None:
+            key = tuple
+        else:
+            key = _tuple_getter([self._col_index(col) for col in subset])
+        if fingerprint:
+            key = _fingerprint(key)
+        self._resolve()
 
-    def remove_duplicates(self):
-        """Removes all duplicate rows from the :class:`Dataset` object
-        while maintaining the original order."""
+        # pythonlibrary.net:
+        # 用len(seen)的变化来判断是否第一次出现，这样每一行只需要计算一次hash
+        # 不重复的行被依次往前（keep='last'时往后）移动，最后删除剩余的位置
+        self._own_data()
+        data = self._data
         seen = set()
-        # pythonlibrary.net: 
-        # 对self._data进行迭代，取出每一行，如果tuple(row)在seen里边没出现，则把tuple(row)加到seen里边
-        # 并将row加到返回的list中，而如果tuple(row)在seen里边出现过则什么都不做
-        # 一个简单的例子：
-        #           a = [1,2,3,4]
-        #           b = list()
-        #           [v for v in a if v == 1 or b.append(v)] 将返回 [1],  b则为[2,3,4]
-        self._data[:] = [row for row in self._data if not (tuple(row) in seen or seen.add(tuple(row)))]
+        add = seen.add
+        positions = range(len(data)) if keep == 'first' else range(len(data) - 1, -1, -1)
+        write = positions.start
+        for i in positions:
+            row = data[i]
+            size = len(seen)
+            add(key(row))
+            if len(seen) != size:
+                data[write] = row
+                write += positions.step
+
+        if keep == 'first':
+            removed = len(data) - write
+            del data[write:]
+        else:
+            removed = write + 1
+            del data[:write + 1]
+
+        self._tag_index = None
+        if removed:
+            self._version += 1
+        return removed
 
     def wipe(self):
         """Removes all content and headers from the :class:`Dataset` object."""
-        self._data = list()
+        self._data = self._storage()
         self.__headers = None
+        self._header_map = None
+        self._tag_index = None
+        self._shared_data = self._shared_rows = False
+        self._lazy_cols, self._pending = (), False
+        self._version += 1
 
     def subset(self, rows=None, cols=None):
         """Returns a new instance of the :class:`Dataset`,
@@ -924,6 +1477,7 @@ class Dataset:
         # Don't return if no data
         if not self:
             return
+        self._resolve()
 
         if rows is None:
             # pythonlibrary.net: 
@@ -937,27 +1491,334 @@ class Dataset:
 
         # filter out impossible rows and columns
         # check if the givn rows and cols actually exist
-        rows = [row for row in rows if row in range(self.height)]
-        cols = [header for header in cols if header in self.headers]
+        rows = set(row for row in rows if row in range(self.height))
+        positions = self._header_positions()
+        cols = [header for header in cols if header in positions]
 
-        _dset = Dataset()
+        _dset = Dataset(storage=self._storage)
 
         # filtering rows and columns
         _dset.headers = list(cols)
 
-        _dset._data = []
-        for row_no, row in enumerate(self._data):
-            data_row = []
-            for key in _dset.headers:
-                if key in self.headers:
-                    pos = self.headers.index(key)
-                    data_row.append(row[pos])
-                else:
-                    raise KeyError
+        get_values = _tuple_getter([positions[key] for key in cols])
+        _dset._data = self._storage(
+            Row(get_values(row)) for row_no, row in enumerate(self._data) if row_no in rows
+        )
+
+        return _dset
 
-            if row_no in rows:
-                _dset.append(row=Row(data_row))
+    def select(self, cols):
+        """Returns a new instance of the :class:`Dataset` with only the given
+        columns, as headers or indexes, in the given order. Row tags and
+        separators are kept. ::
 
+            names = data.select(['first_name', 'last_name'])
+        """
+        return self._project([self._col_index(col) for col in cols])
+
+    def drop(self, cols):
+        """Returns a new instance of the :class:`Dataset` without the given
+        columns, as headers or indexes. Row tags and separators are kept."""
+        width = self.width
+        dropped = set()
+        for col in cols:
+            pos = self._col_index(col)
+            if not -width <= pos < width:
+                raise InvalidDatasetIndex
+            dropped.add(pos + width if pos < 0 else pos)
+        return self._project([pos for pos in range(width) if pos not in dropped])
+
+    def _project(self, positions):
+        """Returns a new Dataset of the columns at `positions`, built in a
+        single pass over the rows."""
+        width = self.width
+        if any(not -width <= pos < width for pos in positions):
+            raise InvalidDatasetIndex
+        # Lazily computed columns left out are not computed.
+        lazy_positions = {lazy.position for lazy in self._lazy_cols}
+        if any(pos % width in lazy_positions for pos in positions):
+            self._resolve()
+
+        get_values = _tuple_getter(positions)
+        _dset = Dataset(title=self.title, storage=self._storage)
+        _dset._data = self._storage(Row(get_values(row), row.tags) for row in self._data)
+        if self.headers:
+            _dset.headers = [self.headers[pos] for pos in positions]
+        _dset._separators = list(self._separators)
+        return _dset
+
+    def group_by(self, keys):
+        """Groups the rows of the :class:`Dataset` by the given key column(s),
+        given as header strings or column indexes. Returns a :class:`GroupBy`
+        whose :meth:`GroupBy.agg` computes the aggregated ``Dataset``. ::
+
+            totals = data.group_by('region').agg({'amount': 'sum'})
+        """
+        return GroupBy(self, keys)
+
+    def join(self, other, on, how='inner'):
+        """Joins another :class:`Dataset` on the given key column(s), and
+        returns a new ``Dataset`` instance. Both datasets must have headers.
+
+        The result has the columns of this ``Dataset`` followed by the
+        columns of ``other``, except its key columns. Rows keep the order of
+        this ``Dataset``, followed for an ``'outer'`` join by the rows of
+        ``other`` without a match.
+
+        :param on: header, or list of headers, present in both datasets.
+        :param how: ``'inner'`` keeps matching rows only, ``'left'`` also
+                    keeps unmatched rows of this ``Dataset``, and ``'outer'``
+                    keeps unmatched rows of both. Missing values are None.
+
+        It is a hash join: the smaller ``Dataset`` is hashed on its keys and
+        the larger one is streamed against it.
+        """
+        if how not in ('inner', 'left', 'outer'):
+            raise ValueError("how must be 'inner', 'left' or 'outer', not %r" % (how,))
+        if not isinstance(other, Dataset):
+            raise InvalidDatasetType
+        if not self.headers or not other.headers:
+            raise HeadersNeeded
+
+        keys = [on] if isinstance(on, str) else list(on)
+        left_pos = [self._col_index(key) for key in keys]
+        right_pos = [other._col_index(key) for key in keys]
+        right_rest = [i for i in range(other.width) if i not in right_pos]
+
+        left_key = _tuple_getter(left_pos)
+        right_key = _tuple_getter(right_pos)
+        right_values = _tuple_getter(right_rest)
+
+        self._resolve()
+        other._resolve()
+        left_rows = list(self._data)
+        right_rows = list(other._data)
+        payloads = [list(right_values(row)) for row in right_rows]
+        right_fill = [None] * len(right_rest)
+
+        # matches[i] lists the indexes of the rows of other matching row i.
+        if len(right_rows) <= len(left_rows):
+            table = {}
+            for j, row in enumerate(right_rows):
+                table.setdefault(right_key(row), []).append(j)
+            matches = [table.get(left_key(row), ()) for row in left_rows]
+        else:
+            table = {}
+            for i, row in enumerate(left_rows):
+                table.setdefault(left_key(row), []).append(i)
+            matches = [[] for _ in left_rows]
+            for j, row in enumerate(right_rows):
+                for i in table.get(right_key(row), ()):
+                    matches[i].append(j)
+
+        data = []
+        for row, js in zip(left_rows, matches):
+            if js:
+                data.extend(row + payloads[j] for j in js)
+            elif how != 'inner':
+                data.append(row + right_fill)
+
+        if how == 'outer':
+            matched = set(chain.from_iterable(matches))
+            for j, row in enumerate(right_rows):
+                if j not in matched:
+                    left_values = [None] * self.width
+                    for pos, value in zip(left_pos, right_key(row)):
+                        left_values[pos] = value
+                    data.append(left_values + payloads[j])
+
+        _dset = Dataset(title=self.title, storage=self._storage)
+        _dset._load_rows(data, headers=self.headers + [other.headers[i] for i in right_rest])
+        return _dset
+
+    def diff(self, other, key=None, fingerprint=False):
+        """Compares this :class:`Dataset` with `other`, a later version of it,
+        and returns the ``(added, removed, changed)`` named tuple of new
+        ``Dataset`` instances holding:
+
+        - ``added``: the rows of `other` whose key is not in this ``Dataset``,
+        - ``removed``: the rows of this ``Dataset`` whose key is not in
+          `other`,
+        - ``changed``: the rows of `other` whose key is in this ``Dataset``
+          with other values. ::
+
+            diff = yesterday.diff(today, key='id')
+            diff.changed.export('csv')
+
+        Each side is read once: the rows of this ``Dataset`` are hashed on
+        their key, then the rows of `other` are looked up. If both datasets
+        have headers, columns of `other` are matched by header, otherwise by
+        position. Rows with the same key are matched in order: the extra rows
+        of a key are removed if in this ``Dataset``, or added if in `other`.
+
+        :param key: (optional) column, as a header or index, or list of
+                    columns identifying a row. Defaults to all columns, in
+                    which case rows are only added or removed.
+        :param fingerprint: remember 64-bit digests of the keys and values of
+                            the rows of this ``Dataset`` instead of their
+                            keys, which bounds the memory used on large
+                            datasets. Values are then compared by ``repr``,
+                            and a digest collision, however unlikely, hides
+                            a change.
+        """
+        if not isinstance(other, Dataset):
+            raise InvalidDatasetType
+        keys = [] if key is None else [key] if isinstance(key, (str, int)) else list(key)
+        if any(isinstance(col, str) for col in keys) and not self.headers:
+            raise HeadersNeeded
+
+        width = self.width
+        align = None
+        if self.headers and other.headers:
+            if len(other.headers) != width:
+                raise InvalidDimensions
+            mapping = [other._col_index(header) for header in self.headers]
+            if mapping != list(range(width)):
+                align = _tuple_getter(mapping)
+        elif self.height and other.height and other.width != width:
+            raise InvalidDimensions
+
+        key_pos = [self._col_index(col) for col in keys] if keys else list(range(width))
+        if not all(-width <= pos < width for pos in key_pos):
+            raise InvalidDatasetIndex
+        key_pos = [pos % width for pos in key_pos]
+        key_of = _tuple_getter(key_pos)
+        payload_of = _tuple_getter([pos for pos in range(width) if pos not in key_pos])
+        if fingerprint:
+            key_of, payload_of = _fingerprint(key_of), _fingerprint(payload_of)
+
+        self._resolve()
+        other._resolve()
+
+        # key -> row index, or (payload digest, row index) with fingerprints,
+        # of the first row of each key, the next ones being kept aside.
+        seen = {}
+        repeated = {}
+        for i, row in enumerate(self._data):
+            key = key_of(row)
+            entry = (payload_of(row), i) if fingerprint else i
+            if key in seen:
+                repeated.setdefault(key, []).append(entry)
+            else:
+                seen[key] = entry
+
+        added, changed = [], []
+        for row in other._data:
+            if align is not None:
+                row = align(row)
+            key = key_of(row)
+            entry = seen.pop(key, None)
+            if entry is not None and key in repeated:
+                seen[key] = repeated[key].pop(0)
+                if not repeated[key]:
+                    del repeated[key]
+            if entry is None:
+                added.append(row)
+            elif fingerprint:
+                if entry[0] != payload_of(row):
+                    changed.append(row)
+            elif payload_of(self._data[entry]) != payload_of(row):
+                changed.append(row)
+
+        entries = chain(seen.values(), chain.from_iterable(repeated.values()))
+        positions = sorted(entry[1] if fingerprint else entry for entry in entries)
+        removed = [self._data[i] for i in positions]
+
+        def result(rows):
+            _dset = Dataset(title=self.title, storage=self._storage)
+            _dset._load_rows(rows, headers=self.headers)
+            return _dset
+
+        return _Diff(result(added), result(removed), result(changed))
+
+
+class GroupBy:
+    """Rows of a :class:`Dataset` grouped by key columns, as returned by
+    :meth:`Dataset.group_by`."""
+
+    AGGREGATES = ('sum', 'mean', 'count', 'min', 'max')
+
+    def __init__(self, dataset, keys):
+        self.dataset = dataset
+        self.keys = [keys] if isinstance(keys, (str, int)) else list(keys)
+
+    def agg(self, aggregates):
+        """Returns a new :class:`Dataset` with one row per group, holding the
+        key values followed by one aggregated value per column.
+
+        :param aggregates: dict mapping a column (header or index) to
+                           ``'sum'``, ``'mean'``, ``'count'``, ``'min'``,
+                           ``'max'`` or a callable receiving the list of the
+                           group values. Like in SQL, None values are ignored,
+                           except by callables.
+
+        Groups are aggregated in a single pass over the rows, in order of
+        first appearance, without building intermediate datasets.
+        """
+        for func in aggregates.values():
+            if not callable(func) and func not in self.AGGREGATES:
+                raise ValueError('Unknown aggregate %r' % (func,))
+
+        key_of = _tuple_getter([self.dataset._col_index(key) for key in self.keys])
+        # (position, kind, callable) per aggregated column
+        columns = [
+            (self.dataset._col_index(col), 'call' if callable(func) else func, func)
+            for col, func in aggregates.items()
+        ]
+
+        # Accumulator per group and column: a list of values for callables,
+        # [sum, count] for means, the count or the current value otherwise.
+        groups = OrderedDict()
+        self.dataset._resolve()
+        for row in self.dataset._data:
+            key = key_of(row)
+            accs = groups.get(key)
+            if accs is None:
+                accs = groups[key] = [
+                    [] if kind == 'call' else [0, 0] if kind == 'mean'
+                    else 0 if kind == 'count' else None
+                    for _, kind, _ in columns
+                ]
+            for i, (pos, kind, _) in enumerate(columns):
+                value = row[pos]
+                if kind == 'call':
+                    accs[i].append(value)
+                elif value is None:
+                    continue
+                elif kind == 'count':
+                    accs[i] += 1
+                elif kind == 'mean':
+                    accs[i][0] += value
+                    accs[i][1] += 1
+                elif accs[i] is None:
+                    accs[i] = value
+                elif kind == 'sum':
+                    accs[i] += value
+                elif kind == 'min':
+                    if value < accs[i]:
+                        accs[i] = value
+                elif value > accs[i]:
+                    accs[i] = value
+
+        data = []
+        for key, accs in groups.items():
+            values = list(key)
+            for acc, (_, kind, func) in zip(accs, columns):
+                if kind == 'call':
+                    acc = func(acc)
+                elif kind == 'mean':
+                    acc = acc[0] / acc[1] if acc[1] else None
+                values.append(acc)
+            data.append(values)
+
+        if self.dataset.headers:
+            headers = [self.dataset.headers[self.dataset._col_index(key)] for key in self.keys]
+            headers.extend(self.dataset.headers[pos] for pos, _, _ in columns)
+        else:
+            headers = None
+
+        _dset = Dataset(title=self.dataset.title)
+        _dset._load_rows(data, headers=headers)
         return _dset
 
 
@@ -1021,17 +1882,25 @@ class Databook:
         :param \\*\\*kwargs: (optional) custom configuration to the format `import_book`.
         """
 
-        stream = normalize_input(in_stream)
-        if not format:
-            format = detect_format(stream)
+        with hooks.event('load', 'databook', format) as event:
+            raw = normalize_input(in_stream)
+            stream, compression = decompress_input(raw)
+            if not format:
+                format = detect_format(stream)
 
-        fmt = registry.get_format(format)
-        if not hasattr(fmt, 'import_book'):
-            # pythonlibrary.net: 
-            # 格式处理器主要具有import_book
-            raise UnsupportedFormat('Format {} cannot be loaded.'.format(format))
+            fmt = registry.get_format(format)
+            if not hasattr(fmt, 'import_book'):
+                # pythonlibrary.net: 
+                # 格式处理器主要具有import_book
+                raise UnsupportedFormat('Format {} cannot be loaded.'.format(format))
+
+            with hooks.phase('parse'), _format_input(format, stream, compression) as stream:
+                fmt.import_book(self, stream, **kwargs)
 
-        fmt.import_book(self, stream, **kwargs)
+            if event is not None:
+                event.format = format
+                event.rows, event.cols = self._dimensions()
+                event.size = hooks.size_of(in_stream if isinstance(in_stream, (str, bytes)) else raw)
         return self
 
     def export(self, format, **kwargs):
@@ -1040,34 +1909,252 @@ class Databook:
 
         :param \\*\\*kwargs: (optional) custom configuration to the format `export_book`.
         """
-        fmt = registry.get_format(format)
-        if not hasattr(fmt, 'export_book'):
-            # pythonlibrary.net: 
-            # 格式处理器主要具有export_book 
-            raise UnsupportedFormat('Format {} cannot be exported.'.format(format))
+        with hooks.event('export', 'databook', format) as event:
+            fmt = registry.get_format(format)
+            if not hasattr(fmt, 'export_book'):
+                # pythonlibrary.net: 
+                # 格式处理器主要具有export_book 
+                raise UnsupportedFormat('Format {} cannot be exported.'.format(format))
+
+            with hooks.phase('serialize'):
+                result = fmt.export_book(self, **kwargs)
+
+            if event is not None:
+                event.rows, event.cols = self._dimensions()
+                event.size = hooks.size_of(result)
+        return result
 
-        return fmt.export_book(self, **kwargs)
+    def _dimensions(self):
+        """Total rows and widest columns count of the :class:`Dataset` objects."""
+        return (sum(dset.height for dset in self._datasets),
+                max((dset.width for dset in self._datasets), default=0))
 
 
 def detect_format(stream):
-    """Return format name of given stream (file-like object, string, or bytestring)."""
-    stream = normalize_input(stream)
-    fmt_title = None
-    for fmt in registry.formats():
-        # pythonlibrary.net: 
-        # 使用所有的格式处理器来检测给定数据流的格式
+    """Return format name of given stream (file-like object, string, or bytestring).
+    Compressed streams are detected by the format of their decompressed content."""
+    with hooks.event('detect', 'stream') as event, hooks.phase('detect'):
+        stream, _ = decompress_input(normalize_input(stream))
+        # Formats read the stream from where the caller left it.
         try:
-            if fmt.detect(stream):
-                fmt_title = fmt.title
-                break
-        except AttributeError:
-            pass
-        finally:
-            if hasattr(stream, 'seek'):
-                stream.seek(0)
+            start = stream.tell()
+        except (AttributeError, OSError, ValueError):
+            start = 0
+        fmt_title = None
+        for fmt in registry.detectable_formats(stream):
+            # pythonlibrary.net: 
+            # 使用所有可能的格式处理器来检测给定数据流的格式
+            try:
+                if registry.is_text(fmt.title):
+                    with text_stream(stream) as text:
+                        detected = fmt.detect(text)
+                else:
+                    detected = fmt.detect(stream)
+                if detected:
+                    fmt_title = fmt.title
+                    break
+            except (AttributeError, UnicodeDecodeError):
+                # Binary content which is not UTF-8 is no text format.
+                pass
+            finally:
+                if hasattr(stream, 'seek'):
+                    stream.seek(start)
+
+        if event is not None:
+            event.format = fmt_title
     return fmt_title
 
 
+@contextmanager
+def _format_input(format, stream, compression=None):
+    """Yields `stream` ready to be imported by the `format`: decoded if the
+    format reads text, and closed afterwards if it was decompressed."""
+    try:
+        if registry.is_text(format):
+            with text_stream(stream) as text:
+                yield text
+        else:
+            yield stream
+    finally:
+        if compression is not None:
+            stream.close()
+
+
+@lru_cache(maxsize=64)
+def _record_type(fields):
+    """Returns the namedtuple class of rows with `fields`, cached so that
+    iterating over datasets with the same headers does not rebuild it."""
+    return namedtuple('Record', fields, rename=True)
+
+
+def _tuple_getter(positions):
+    """Returns a function picking the values at `positions` of a row as a
+    tuple, which :func:`operator.itemgetter` does not do for one position."""
+    if not positions:
+        return lambda row: ()
+    if len(positions) == 1:
+        pos = positions[0]
+        return lambda row: (row[pos],)
+    return itemgetter(*positions)
+
+
+def _rows_from(rows, start):
+    """Returns an iterator over the `rows` from position `start`, without
+    going through the rows before it."""
+    if isinstance(rows, list):
+        return iter(rows[start:])
+    if hasattr(rows, 'iter_from'):
+        return rows.iter_from(start)
+    return islice(rows, start, None)
+
+
+def _map_chunk(func, values):
+    return [func(value) for value in values]
+
+
+def _map_chunks(func, values, workers=None, executor='thread', chunksize=None):
+    """Returns the list of `func` applied to each of `values`, in order,
+    computed by chunks in a pool of `workers` threads or processes or in the
+    given :class:`concurrent.futures.Executor`."""
+    # Imported here, the pools pull in multiprocessing and logging which
+    # would slow down `import tablib`.
+    from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+    if isinstance(executor, Executor):
+        pool = executor
+    elif executor in ('thread', 'process'):
+        pool = None
+    else:
+        raise ValueError("executor must be 'thread', 'process' or an Executor, not %r" % (executor,))
+    workers = workers or os.cpu_count() or 1
+    if pool is None and workers == 1:
+        return list(map(func, values))
+
+    if chunksize is None:
+        chunksize = -(-len(values) // (workers * 4)) or 1
+    chunks = [values[i:i + chunksize] for i in range(0, len(values), chunksize)]
+    if pool is None:
+        pool_class = ThreadPoolExecutor if executor == 'thread' else ProcessPoolExecutor
+        with pool_class(max_workers=workers) as pool:
+            results = list(pool.map(partial(_map_chunk, func), chunks))
+    else:
+        results = list(pool.map(partial(_map_chunk, func), chunks))
+    return list(chain.from_iterable(results))
+
+
+def _fingerprint(key):
+    """Wraps the `key` function of a row to return a 64-bit digest of it."""
+    def fingerprint(row):
+        digest = sha1(repr(key(row)).encode('utf-8', 'backslashreplace')).digest()
+        return int.from_bytes(digest[:8], 'little')
+    return fingerprint
+
+
+def _occurrences(headers):
+    """Returns (header, n) keys telling apart repeated headers."""
+    seen = {}
+    keys = []
+    for header in headers:
+        seen[header] = seen.get(header, -1) + 1
+        keys.append((header, seen[header]))
+    return keys
+
+
+def concat(datasets, align='headers', fill=None):
+    """Stack :class:`Dataset` instances together by joining at the row level,
+    and return a new combined ``Dataset`` instance. Row tags are kept.
+
+    With ``align='headers'``, columns are matched by header name: the result
+    has the union of all headers, in order of appearance, and ``fill`` is used
+    for the columns a ``Dataset`` does not have. Datasets without headers can
+    only be stacked by position. With ``align=None`` columns are matched by
+    position, so all datasets must have the same width.
+
+    Rows are copied in a single pass, whatever the number of datasets.
+    """
+    datasets = list(datasets)
+    if not all(isinstance(dset, Dataset) for dset in datasets):
+        raise InvalidDatasetType
+    for dset in datasets:
+        dset._resolve()
+
+    with_headers = [bool(dset.headers) for dset in datasets]
+
+    if align == 'headers' and any(with_headers):
+        if not all(with_headers):
+            raise HeadersNeeded
+
+        positions = OrderedDict()
+        for dset in datasets:
+            for key in _occurrences(dset.headers):
+                positions.setdefault(key, len(positions))
+        headers = [header for header, _ in positions]
+        identity = list(range(len(headers)))
+        mappings = []
+        for dset in datasets:
+            mapping = [positions[key] for key in _occurrences(dset.headers)]
+            # Datasets already in the final column order are copied as is.
+            mappings.append(None if mapping == identity else mapping)
+    elif align in ('headers', None):
+        if len({dset.width for dset in datasets if dset.height}) > 1:
+            raise InvalidDimensions
+        headers = next((dset.headers for dset in datasets if dset.headers), None)
+        mappings = [None] * len(datasets)
+    else:
+        raise ValueError("align must be 'headers' or None, not %r" % (align,))
+
+    width = len(headers) if headers else 0
+
+    def rows():
+        for dset, mapping in zip(datasets, mappings):
+            for row in dset._data:
+                if mapping is None:
+                    values = row
+                else:
+                    values = [fill] * width
+                    for position, value in zip(mapping, row):
+                        values[position] = value
+                yield Row(values, tags=row.tags)
+
+    _dset = Dataset(storage=datasets[0]._storage if datasets else None)
+    _dset._data = _dset._storage(rows())
+    _dset.headers = headers
+    return _dset
+
+
+def concat_cols(datasets):
+    """Stack :class:`Dataset` instances together by joining at the column
+    level, and return a new combined ``Dataset`` instance. If any ``Dataset``
+    has headers set, all of them must as well, and all of them must have the
+    same height.
+
+    Rows are joined in a single pass, whatever the number of columns.
+    """
+    datasets = list(datasets)
+    if not all(isinstance(dset, Dataset) for dset in datasets):
+        raise InvalidDatasetType
+    for dset in datasets:
+        dset._resolve()
+
+    with_headers = [bool(dset.headers) for dset in datasets]
+    if any(with_headers) and not all(with_headers):
+        raise HeadersNeeded
+
+    if len({dset.height for dset in datasets}) > 1:
+        raise InvalidDimensions
+
+    if datasets and all(with_headers):
+        headers = list(chain.from_iterable(dset.headers for dset in datasets))
+    else:
+        headers = None
+
+    row_lists = zip(*(dset._data for dset in datasets))
+
+    _dset = Dataset(storage=datasets[0]._storage if datasets else None)
+    _dset._load_rows((chain.from_iterable(parts) for parts in row_lists), headers=headers)
+    return _dset
+
+
 def import_set(stream, format=None, **kwargs):
     """Return dataset of given stream (file-like object, string, or bytestring)."""
 
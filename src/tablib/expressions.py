@@ -0,0 +1,162 @@
+"""
+    tablib.expressions
+    ~~~~~~~~~~~~~~~~~~
+
+    Column expressions, used to filter rows with :meth:`Dataset.where`. ::
+
+        from tablib import col
+
+        data.where((col('amount') > 100) & col('region').isin(['north', 'east']))
+
+    An expression is compiled once per :class:`Dataset` into a single function
+    of the row values, column headers being resolved to positions beforehand.
+"""
+
+import operator
+
+
+class Expression:
+    """An expression on the columns of a row. Combine expressions with
+    comparison and arithmetic operators, ``&`` (and), ``|`` (or) and ``~``
+    (not). Mind the parentheses, ``&`` and ``|`` bind tighter than
+    comparisons."""
+
+    # Expressions define __eq__, so they cannot be hashed.
+    __hash__ = None
+
+    def __bool__(self):
+        # Otherwise `a < col('x') < b` and `and` / `or` would silently drop
+        # one of the expressions.
+        raise TypeError(
+            'The truth value of an Expression is ambiguous, combine expressions '
+            'with & (and), | (or) and ~ (not) instead of and, or, not and chained '
+            'comparisons.'
+        )
+
+    def __init__(self, compile):
+        self._compile = compile
+
+    def compile(self, dataset):
+        """Returns a function computing the expression from a row, as a list
+        of values, of `dataset`."""
+        return self._compile(dataset)
+
+    def _binary(self, op, other, reverse=False):
+        left, right = (other, self) if reverse else (self, other)
+
+        def compile(dataset):
+            if isinstance(right, Expression):
+                get_right = right.compile(dataset)
+                if isinstance(left, Expression):
+                    get_left = left.compile(dataset)
+                    return lambda row: op(get_left(row), get_right(row))
+                return lambda row: op(left, get_right(row))
+            get_left = left.compile(dataset)
+            return lambda row: op(get_left(row), right)
+        return Expression(compile)
+
+    def __eq__(self, other):
+        return self._binary(operator.eq, other)
+
+    def __ne__(self, other):
+        return self._binary(operator.ne, other)
+
+    def __lt__(self, other):
+        return self._binary(operator.lt, other)
+
+    def __le__(self, other):
+        return self._binary(operator.le, other)
+
+    def __gt__(self, other):
+        return self._binary(operator.gt, other)
+
+    def __ge__(self, other):
+        return self._binary(operator.ge, other)
+
+    def __add__(self, other):
+        return self._binary(operator.add, other)
+
+    def __radd__(self, other):
+        return self._binary(operator.add, other, reverse=True)
+
+    def __sub__(self, other):
+        return self._binary(operator.sub, other)
+
+    def __rsub__(self, other):
+        return self._binary(operator.sub, other, reverse=True)
+
+    def __mul__(self, other):
+        return self._binary(operator.mul, other)
+
+    def __rmul__(self, other):
+        return self._binary(operator.mul, other, reverse=True)
+
+    def __truediv__(self, other):
+        return self._binary(operator.truediv, other)
+
+    def __rtruediv__(self, other):
+        return self._binary(operator.truediv, other, reverse=True)
+
+    def __and__(self, other):
+        def compile(dataset):
+            left, right = self.compile(dataset), _compile(other, dataset)
+            return lambda row: bool(left(row)) and bool(right(row))
+        return Expression(compile)
+
+    __rand__ = __and__
+
+    def __or__(self, other):
+        def compile(dataset):
+            left, right = self.compile(dataset), _compile(other, dataset)
+            return lambda row: bool(left(row)) or bool(right(row))
+        return Expression(compile)
+
+    __ror__ = __or__
+
+    def __invert__(self):
+        def compile(dataset):
+            operand = self.compile(dataset)
+            return lambda row: not operand(row)
+        return Expression(compile)
+
+    def isin(self, values):
+        """True if the value is one of `values`."""
+        values = list(values)
+        try:
+            values = frozenset(values)
+        except TypeError:
+            # Unhashable values are looked up in the list.
+            pass
+
+        def compile(dataset):
+            operand = self.compile(dataset)
+            return lambda row: operand(row) in values
+        return Expression(compile)
+
+    def is_none(self):
+        """True if the value is None."""
+        def compile(dataset):
+            operand = self.compile(dataset)
+            return lambda row: operand(row) is None
+        return Expression(compile)
+
+    def apply(self, func):
+        """Applies `func` to the value."""
+        def compile(dataset):
+            operand = self.compile(dataset)
+            return lambda row: func(operand(row))
+        return Expression(compile)
+
+
+def _compile(value, dataset):
+    if isinstance(value, Expression):
+        return value.compile(dataset)
+    return lambda row: value
+
+
+def col(column):
+    """Returns an :class:`Expression` for the value of `column`, a header
+    string or a column index."""
+    def compile(dataset):
+        return operator.itemgetter(dataset._col_index(column))
+    return Expression(compile)
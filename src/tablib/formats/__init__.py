@@ -6,7 +6,7 @@ from importlib import import_module
 from importlib.util import find_spec
 
 from tablib.exceptions import UnsupportedFormat
-from tablib.utils import normalize_input
+from tablib.utils import peek
 
 from ._csv import CSVFormat
 from ._json import JSONFormat
@@ -23,6 +23,49 @@ uninstalled_format_messages = {
 }
 
 
+ZIP_SIGNATURE = b'PK\x03\x04'
+OLE2_SIGNATURE = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+TABLIB_SIGNATURE = b'TABLIB'
+DBF_VERSIONS = frozenset(
+    b'\x02\x03\x04\x05\x30\x31\x32\x43\x63\x7b\x83\x8b\x8e\xcb\xf5\xfb'
+)
+
+
+def sniff_zip(head):
+    """Cheap check for zip based formats (xlsx, ods)."""
+    return isinstance(head, bytes) and head.startswith(ZIP_SIGNATURE)
+
+
+def sniff_ole2(head):
+    """Cheap check for OLE2 compound documents (xls)."""
+    return isinstance(head, bytes) and head.startswith(OLE2_SIGNATURE)
+
+
+def sniff_tablib(head):
+    """Cheap check for the native Tablib binary format."""
+    return isinstance(head, bytes) and head.startswith(TABLIB_SIGNATURE)
+
+
+def sniff_dbf(head):
+    """Cheap check for dBASE files: version byte followed by a YY MM DD date."""
+    return (
+        isinstance(head, bytes) and len(head) >= 4 and head[0] in DBF_VERSIONS
+        and head[2] <= 12 and head[3] <= 31
+    )
+
+
+def sniff_text(head):
+    """Cheap check for text formats, ruling out known binary signatures."""
+    return head is not None and not (
+        sniff_zip(head) or sniff_ole2(head) or sniff_tablib(head)
+    )
+
+
+def sniff_object(head):
+    """Cheap check for in-memory objects which are not streams (DataFrame)."""
+    return head is None
+
+
 def load_format_class(dotted_path):
     try:
         # pythonlibrary.net: 
@@ -54,7 +97,9 @@ class FormatDescriptorBase:
         # pythonlibrary.net: 
         # _format 是从模块中加载进来的类
         if self._format is None:
-            self._format = load_format_class(self._format_path)
+            # Going through the registry checks the format dependencies
+            # only once the format is actually used.
+            self._format = registry.get_format(self.key)
 
 
 class ImportExportBookDescriptor(FormatDescriptorBase):
@@ -63,28 +108,31 @@ class ImportExportBookDescriptor(FormatDescriptorBase):
         # 描述器
         # obj是parent类的实例
         # cls是parent类
-        self.ensure_format_loaded()
-        return self._format.export_book(obj, **kwargs)
+        # Go through Databook.export/load so that hooks see these calls too.
+        return obj.export(self.key, **kwargs)
 
     def __set__(self, obj, val):
-        self.ensure_format_loaded()
-        return self._format.import_book(obj, normalize_input(val))
+        obj.load(val, self.key)
 
 
 class ImportExportSetDescriptor(FormatDescriptorBase):
     def __get__(self, obj, cls, **kwargs):
-        self.ensure_format_loaded()
-        return self._format.export_set(obj, **kwargs)
+        return obj.export(self.key, **kwargs)
 
     def __set__(self, obj, val):
-        self.ensure_format_loaded()
-        return self._format.import_set(obj, normalize_input(val))
+        obj.load(val, self.key)
 
 
 class Registry:
     _formats = OrderedDict()
+    # Modules a format needs, checked lazily and cached in `_available`.
+    _requires = {}
+    _available = {}
+    # Cheap checks run on the stream head before loading a format for
+    # detection. `None` always loads the format, `False` skips detection.
+    _sniffs = {}
 
-    def register(self, key, format_or_path):
+    def register(self, key, format_or_path, requires=(), sniff=None):
         from tablib.core import Databook, Dataset
 
         # Create Databook.<format> read or read/write properties
@@ -106,50 +154,96 @@ class Registry:
             setattr(Dataset, 'get_%s' % key, partialmethod(Dataset._get_in_format, key))
 
         self._formats[key] = format_or_path
+        self._requires[key] = tuple(requires)
+        self._sniffs[key] = sniff
+        self._available.pop(key, None)
+
+    def unregister(self, key):
+        """Removes the `key` format and the Dataset and Databook attributes
+        created when registering it."""
+        from tablib.core import Databook, Dataset
+
+        for cls, name in ((Databook, key), (Dataset, key),
+                          (Dataset, 'get_%s' % key), (Dataset, 'set_%s' % key)):
+            if name in vars(cls):
+                delattr(cls, name)
+
+        del self._formats[key]
+        for mapping in (self._requires, self._sniffs, self._available):
+            mapping.pop(key, None)
 
     def register_builtins(self):
         # Registration ordering matters for autodetection.
-        self.register('json', JSONFormat())
+        self.register('tablib', 'tablib.formats._tablib.TablibFormat', sniff=sniff_tablib)
+        self.register('json', JSONFormat(), sniff=sniff_text)
+        self.register('jsonl', 'tablib.formats._jsonl.JSONLinesFormat', sniff=sniff_text)
         # xlsx before as xls (xlrd) can also read xlsx
 
         # pythonlibrary.net: 
-        # find_spec函数可以检测某一个python模块是不是被安装
-        # 只注册那些依赖库被安装过的格式处理器
         # 因为JSONFormat, CSVFormat, TSVFrmat不需要第三方依赖库，所以可以以类实例的方法直接注册
-        # 其他格式处理器都需要安装依赖，因此，先要判断是否安装，如果安装了，则通过类本身注册
-        if find_spec('openpyxl'):
-            self.register('xlsx', 'tablib.formats._xlsx.XLSXFormat')
-        if find_spec('xlrd') and find_spec('xlwt'):
-            self.register('xls', 'tablib.formats._xls.XLSFormat')
-        if find_spec('yaml'):
-            self.register('yaml', 'tablib.formats._yaml.YAMLFormat')
-        self.register('csv', CSVFormat())
-        self.register('tsv', TSVFormat())
-        if find_spec('odf'):
-            self.register('ods', 'tablib.formats._ods.ODSFormat')
-        self.register('dbf', 'tablib.formats._dbf.DBFFormat')
-        if find_spec('MarkupPy'):
-            self.register('html', 'tablib.formats._html.HTMLFormat')
-        self.register('jira', 'tablib.formats._jira.JIRAFormat')
-        self.register('latex', 'tablib.formats._latex.LATEXFormat')
-        if find_spec('pandas'):
-            self.register('df', 'tablib.formats._df.DataFrameFormat')
-        self.register('rst', 'tablib.formats._rst.ReSTFormat')
-        if find_spec('tabulate'):
-            self.register('cli', 'tablib.formats._cli.CLIFormat')
+        # 其他格式处理器都需要安装依赖，它们通过类的路径注册，并在第一次使用时才检查依赖是否安装
+        self.register('xlsx', 'tablib.formats._xlsx.XLSXFormat',
+                      requires=('openpyxl',), sniff=sniff_zip)
+        self.register('xls', 'tablib.formats._xls.XLSFormat',
+                      requires=('xlrd', 'xlwt'), sniff=sniff_ole2)
+        self.register('yaml', 'tablib.formats._yaml.YAMLFormat',
+                      requires=('yaml',), sniff=sniff_text)
+        self.register('csv', CSVFormat(), sniff=sniff_text)
+        self.register('tsv', TSVFormat(), sniff=sniff_text)
+        self.register('ods', 'tablib.formats._ods.ODSFormat',
+                      requires=('odf',), sniff=sniff_zip)
+        self.register('dbf', 'tablib.formats._dbf.DBFFormat', sniff=sniff_dbf)
+        self.register('html', 'tablib.formats._html.HTMLFormat',
+                      requires=('MarkupPy',), sniff=False)
+        self.register('jira', 'tablib.formats._jira.JIRAFormat', sniff=False)
+        self.register('latex', 'tablib.formats._latex.LATEXFormat', sniff=False)
+        self.register('df', 'tablib.formats._df.DataFrameFormat',
+                      requires=('pandas',), sniff=sniff_object)
+        self.register('rst', 'tablib.formats._rst.ReSTFormat', sniff=False)
+        self.register('cli', 'tablib.formats._cli.CLIFormat',
+                      requires=('tabulate',), sniff=False)
+
+    def is_available(self, key):
+        """Returns True if the dependencies of the `key` format are installed.
+
+        The check runs on first access only and is cached afterwards.
+        """
+        if key not in self._available:
+            # pythonlibrary.net:
+            # find_spec函数可以检测某一个python模块是不是被安装
+            self._available[key] = all(find_spec(name) for name in self._requires.get(key, ()))
+        return self._available[key]
+
+    def is_text(self, key):
+        """Returns True if the `key` format only reads text, binary streams
+        being decoded before they are given to it. Formats like JSON and YAML
+        read bytes as well and detect their encoding themselves."""
+        return getattr(self.get_format(key), 'text_input', False)
 
     def formats(self):
         # pythonlibrary.net: 
         # 所有的格式处理器将被放在_formats
-        for key, frm in self._formats.items():
-            if isinstance(frm, str):
-                self._formats[key] = load_format_class(frm)
-            yield self._formats[key]
+        for key in list(self._formats):
+            if self.is_available(key):
+                yield self.get_format(key)
+
+    def detectable_formats(self, stream):
+        """Yields the formats which may detect `stream`, in registration order.
+
+        Formats whose cheap check on the stream head fails are never loaded.
+        """
+        head = peek(stream)
+        for key in list(self._formats):
+            sniff = self._sniffs.get(key)
+            if sniff is False or (sniff is not None and not sniff(head)):
+                continue
+            if self.is_available(key):
+                yield self.get_format(key)
 
     def get_format(self, key):
         # pythonlibrary.net: 
         # 通过格式处理器的名字获取格式处理器
-        if key not in self._formats:
+        if key not in self._formats or not self.is_available(key):
             if key in uninstalled_format_messages:
                 raise UnsupportedFormat(
                     "The '{key}' format is not available. You may want to install the "
@@ -10,6 +10,8 @@ class CSVFormat:
     extensions = ('csv',)
 
     DEFAULT_DELIMITER = ','
+    # The csv module reads text, binary streams are decoded first.
+    text_input = True
 
     # pythonlibrary.net: 
 	# ЩΪclassmethod, ΪǶ̬Ľformatעȥ
@@ -24,10 +26,7 @@ class CSVFormat:
 		# ʲôkeyڣ򴴽µ
         kwargs.setdefault('delimiter', cls.DEFAULT_DELIMITER)
 
-        _csv = csv.writer(stream, **kwargs)
-
-        for row in dataset._package(dicts=False):
-            _csv.writerow(row)
+        cls.write_rows(stream, dataset._export_rows(), headers=dataset.headers, **kwargs)
 
         stream.seek(0)
         return stream
@@ -44,9 +43,7 @@ class CSVFormat:
 
         dset.wipe()
 
-        kwargs.setdefault('delimiter', cls.DEFAULT_DELIMITER)
-
-        rows = csv.reader(in_stream, **kwargs)
+        rows = cls.read_rows(in_stream, **kwargs)
         for i, row in enumerate(rows):
 
             if (i == 0) and (headers):
@@ -56,6 +53,23 @@ class CSVFormat:
                     row += [''] * (dset.width - len(row))
                 dset.append(row)
 
+    @classmethod
+    def read_rows(cls, in_stream, headers=True, **kwargs):
+        """Yields the rows of a CSV stream as lists, the header row included."""
+        kwargs.setdefault('delimiter', cls.DEFAULT_DELIMITER)
+        return csv.reader(in_stream, **kwargs)
+
+    @classmethod
+    def write_rows(cls, out_stream, rows, headers=None, **kwargs):
+        """Writes the `headers` (if any) then the `rows` to a CSV stream."""
+        kwargs.setdefault('delimiter', cls.DEFAULT_DELIMITER)
+
+        _csv = csv.writer(out_stream, **kwargs)
+
+        if headers:
+            _csv.writerow(headers)
+        _csv.writerows(rows)
+
     @classmethod
     def detect(cls, stream, delimiter=None):
         """Returns True if given stream is valid CSV."""
@@ -0,0 +1,80 @@
+""" Tablib - JSON Lines Support
+"""
+import json
+from io import StringIO
+
+from ._json import serialize_objects_handler
+
+
+class JSONLinesFormat:
+    title = 'jsonl'
+    extensions = ('jsonl', 'ndjson')
+    # Rows are written as objects keyed by the headers, not after a header row.
+    keyed_rows = True
+    # Lines are read as text, binary streams are decoded first.
+    text_input = True
+
+    @classmethod
+    def export_set(cls, dataset):
+        """Returns JSON Lines representation of Dataset."""
+        stream = StringIO()
+        cls.write_rows(stream, dataset._export_rows(), headers=dataset.headers)
+        return stream.getvalue()
+
+    @classmethod
+    def import_set(cls, dset, in_stream, headers=True):
+        """Returns dataset from JSON Lines stream."""
+
+        dset.wipe()
+
+        for i, row in enumerate(cls.read_rows(in_stream, headers=headers)):
+            if (i == 0) and (headers):
+                dset.headers = row
+            else:
+                dset.append(row)
+
+    @classmethod
+    def read_rows(cls, in_stream, headers=True):
+        """Yields the rows of a JSON Lines stream as lists. Lines are objects
+        or arrays; with `headers`, the keys of the first object are yielded
+        first and the values of every object follow this order."""
+        keys = None
+        for line in in_stream:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if isinstance(item, dict):
+                if keys is None:
+                    keys = list(item)
+                    if headers:
+                        yield keys
+                yield [item.get(key) for key in keys]
+            else:
+                yield item
+
+    @classmethod
+    def write_rows(cls, out_stream, rows, headers=None):
+        """Writes the `rows` to a JSON Lines stream, as objects keyed by
+        `headers` if given, or as arrays."""
+        for row in rows:
+            item = dict(zip(headers, row)) if headers else list(row)
+            out_stream.write(json.dumps(item, default=serialize_objects_handler))
+            out_stream.write('\n')
+
+    @classmethod
+    def detect(cls, stream, lines=10):
+        """Returns True if the first lines of the stream are JSON objects or
+        arrays."""
+        try:
+            found = False
+            for _ in range(lines):
+                line = stream.readline()
+                if not line:
+                    break
+                if line.strip():
+                    if not isinstance(json.loads(line), (dict, list)):
+                        return False
+                    found = True
+            return found
+        except (TypeError, ValueError):
+            return False
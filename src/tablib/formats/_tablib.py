@@ -0,0 +1,300 @@
+""" Tablib - Native binary format.
+
+Layout of a file, all numbers being little-endian::
+
+    header     b'TABLIB', version byte, flags byte, metadata size (uint64)
+    metadata   UTF-8 JSON: title, headers, height, separators, tags, and the
+               schema of each column with the offset and size of its block
+    blocks     one block per column, each starting on an 8 bytes boundary
+
+Column blocks hold int64, float64, bool or string values as packed arrays,
+with a null mask when the column has None values. Other columns are pickled
+and only unpickle the types listed in ``SAFE_CLASSES``. Blocks are
+compressed one by one when a compression is chosen, otherwise they can be
+read straight from a memory-mapped file. Values of other types, and tags
+other than strings, numbers, booleans and None, are refused on export.
+"""
+
+import io
+import json
+import mmap
+import pickle
+import struct
+import sys
+from array import array
+from importlib import import_module
+
+SIGNATURE = b'TABLIB'
+VERSION = 1
+HEADER = struct.Struct('<6sBBQ')
+ALIGNMENT = 8
+
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+COMPRESSIONS = {'zlib': 'zlib', 'bz2': 'bz2', 'lzma': 'lzma'}
+
+# Tags are stored as JSON.
+TAG_TYPES = (str, int, float, bool, type(None))
+
+SAFE_CLASSES = frozenset([
+    ('builtins', 'complex'),
+    ('builtins', 'frozenset'),
+    ('builtins', 'set'),
+    ('builtins', 'slice'),
+    ('collections', 'OrderedDict'),
+    ('datetime', 'date'),
+    ('datetime', 'datetime'),
+    ('datetime', 'time'),
+    ('datetime', 'timedelta'),
+    ('datetime', 'timezone'),
+    ('decimal', 'Decimal'),
+    ('uuid', 'UUID'),
+])
+
+
+class _SafeUnpickler(pickle.Unpickler):
+    def find_class(self, module, name):
+        if (module, name) not in SAFE_CLASSES:
+            raise pickle.UnpicklingError(
+                'Tablib files cannot hold %s.%s values.' % (module, name)
+            )
+        return super().find_class(module, name)
+
+
+def _pad(size):
+    return -size % ALIGNMENT
+
+
+def _packed(typecode, values):
+    data = array(typecode, values)
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return data.tobytes()
+
+
+def _unpacked(typecode, block):
+    data = array(typecode)
+    data.frombytes(block)
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return data.tolist()
+
+
+def _column_type(values):
+    """Returns the block type fitting all `values`, and whether they include
+    None."""
+    types = set(map(type, values))
+    nulls = type(None) in types
+    types.discard(type(None))
+    if len(types) != 1:
+        return ('object' if types else 'null'), nulls
+    kind = types.pop()
+    if kind is int and INT64_MIN <= min(v for v in values if v is not None) \
+            and max(v for v in values if v is not None) <= INT64_MAX:
+        return 'int', nulls
+    if kind in (float, bool, str):
+        return kind.__name__, nulls
+    return 'object', nulls
+
+
+def _encode(kind, values, nulls):
+    """Returns the block of a column of `values`."""
+    if kind == 'object':
+        block = pickle.dumps(list(values), pickle.HIGHEST_PROTOCOL)
+        # Read back like on import, so that files which could not be loaded
+        # are refused when written.
+        try:
+            _SafeUnpickler(io.BytesIO(block)).load()
+        except pickle.UnpicklingError as err:
+            raise TypeError(str(err))
+        return block
+
+    parts = []
+    if nulls:
+        parts.append(bytes(value is None for value in values))
+        fill = {'int': 0, 'float': 0.0, 'bool': False, 'str': ''}.get(kind)
+        values = [fill if value is None else value for value in values]
+
+    if kind == 'int':
+        parts.append(_packed('q', values))
+    elif kind == 'float':
+        parts.append(_packed('d', values))
+    elif kind == 'bool':
+        parts.append(bytes(values))
+    elif kind == 'str':
+        # Character offsets, so that the text is decoded once and sliced.
+        offsets = [0]
+        total = 0
+        for value in values:
+            total += len(value)
+            offsets.append(total)
+        parts.append(_packed('q', offsets))
+        parts.append(''.join(values).encode('utf-8', 'surrogatepass'))
+    return b''.join(parts)
+
+
+def _decode(kind, block, height, nulls):
+    """Returns the list of values of a column block."""
+    if kind == 'null':
+        return [None] * height
+    if kind == 'object':
+        return _SafeUnpickler(io.BytesIO(block)).load()
+
+    if nulls:
+        mask, block = block[:height], block[height:]
+
+    if kind == 'int':
+        values = _unpacked('q', block)
+    elif kind == 'float':
+        values = _unpacked('d', block)
+    elif kind == 'bool':
+        values = [value == 1 for value in bytes(block)]
+    elif kind == 'str':
+        size = (height + 1) * 8
+        offsets = _unpacked('q', block[:size])
+        text = bytes(block[size:]).decode('utf-8', 'surrogatepass')
+        values = [text[start:end] for start, end in zip(offsets, offsets[1:])]
+    else:
+        raise ValueError('Unknown column type %r' % (kind,))
+
+    if nulls:
+        values = [None if null else value for null, value in zip(bytes(mask), values)]
+    return values
+
+
+class TablibFormat:
+    title = 'tablib'
+    extensions = ('tablib',)
+
+    @classmethod
+    def export_set(cls, dataset, compression=None):
+        """Returns the binary representation of Dataset, with column blocks
+        compressed by `compression` (``'zlib'``, ``'bz2'`` or ``'lzma'``)."""
+        if compression is not None and compression not in COMPRESSIONS:
+            raise ValueError('Unknown compression %r' % (compression,))
+        codec = import_module(COMPRESSIONS[compression]) if compression else None
+
+        dataset._resolve()
+        if dataset._formatters:
+            rows = dataset._package(dicts=False)
+            if dataset.headers:
+                rows = rows[1:]
+            rows = [list(row) for row in rows]
+        else:
+            rows = list(dataset._data)
+        height, width = len(rows), dataset.width
+
+        schema = []
+        blocks = []
+        offset = 0
+        for values in (zip(*rows) if rows else [()] * width):
+            kind, nulls = _column_type(values)
+            block = b'' if kind == 'null' else _encode(kind, values, nulls)
+            if codec is not None:
+                block = codec.compress(block)
+            schema.append({'type': kind, 'nulls': nulls, 'offset': offset, 'size': len(block)})
+            blocks.append(block)
+            blocks.append(b'\0' * _pad(len(block)))
+            offset += len(block) + _pad(len(block))
+
+        tags = [[i, list(row.tags)] for i, row in enumerate(dataset._data) if row.tags]
+        for _, row_tags in tags:
+            for tag in row_tags:
+                if not isinstance(tag, TAG_TYPES):
+                    # Other tags would not come back the same from JSON.
+                    raise TypeError('Tablib files cannot hold %r tags.' % (tag,))
+        meta = json.dumps({
+            'title': dataset.title,
+            'headers': dataset.headers,
+            'height': height,
+            'width': width,
+            'compression': compression,
+            'columns': schema,
+            'tags': tags,
+            'separators': dataset._separators,
+        }).encode('utf-8')
+
+        return b''.join([
+            HEADER.pack(SIGNATURE, VERSION, 0, len(meta)), meta, b'\0' * _pad(len(meta))
+        ] + blocks)
+
+    @classmethod
+    def import_set(cls, dset, in_stream, columns=None):
+        """Returns dataset from a binary stream. Only the `columns` given as
+        headers or indexes are decoded, if given.
+
+        Uncompressed files are memory-mapped, so that only the blocks of the
+        decoded columns are read from disk.
+        """
+        start = in_stream.tell() if hasattr(in_stream, 'tell') else 0
+        head = in_stream.read(HEADER.size)
+        signature, version, _, meta_size = HEADER.unpack(head)
+        if signature != SIGNATURE:
+            raise ValueError('Not a Tablib binary stream.')
+        if version > VERSION:
+            raise ValueError('Unsupported Tablib binary version %d.' % version)
+        meta = json.loads(in_stream.read(meta_size).decode('utf-8'))
+        data_start = start + HEADER.size + meta_size + _pad(meta_size)
+
+        schema = meta['columns']
+        headers = meta['headers']
+        height = meta['height']
+        positions = list(range(meta['width']))
+        if columns is not None:
+            positions = [
+                headers.index(col) if isinstance(col, str) and headers else col
+                for col in columns
+            ]
+            headers = [headers[pos] for pos in positions] if headers else None
+
+        codec = import_module(COMPRESSIONS[meta['compression']]) if meta['compression'] else None
+
+        source = None
+        # Only plain files are mapped: decompressing readers, like GzipFile,
+        # return the descriptor of the compressed file.
+        if codec is None and isinstance(in_stream, (io.FileIO, io.BufferedReader, io.BufferedRandom)):
+            try:
+                source = mmap.mmap(in_stream.fileno(), 0, access=mmap.ACCESS_READ)
+            except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+                pass
+        if source is None:
+            in_stream.seek(data_start)
+            source = in_stream.read()
+            data_start = 0
+
+        values = []
+        view = memoryview(source)
+        try:
+            for pos in positions:
+                column = schema[pos]
+                begin = data_start + column['offset']
+                block = view[begin:begin + column['size']]
+                if codec is not None:
+                    block = codec.decompress(block)
+                values.append(_decode(column['type'], block, height, column['nulls']))
+                del block
+        finally:
+            view.release()
+            if isinstance(source, mmap.mmap):
+                try:
+                    source.close()
+                except BufferError:
+                    # Still referenced by a traceback, closed once collected.
+                    pass
+
+        dset.wipe()
+        dset._load_rows(zip(*values) if values else [()] * height, headers=headers)
+        dset.title = meta['title']
+        dset._separators = [tuple(sep) for sep in meta['separators']]
+        from tablib.core import Row
+
+        for i, tags in meta['tags']:
+            dset._data[i] = Row(dset._data[i], tags)
+
+    @classmethod
+    def detect(cls, stream):
+        """Returns True if given stream starts with the Tablib signature."""
+        try:
+            return stream.read(len(SIGNATURE)) == SIGNATURE
+        except Exception:
+            return False
@@ -0,0 +1,172 @@
+"""
+    tablib.hooks
+    ~~~~~~~~~~~~
+
+    Instrumentation hooks for import, export and format detection.
+
+    Callbacks registered with :func:`register` receive an :class:`Event`
+    once each :meth:`Dataset.load`, :meth:`Dataset.export`,
+    :meth:`Databook.load`, :meth:`Databook.export` or :func:`detect_format`
+    call completes. Errors raised by callbacks are reported as warnings. ::
+
+        from tablib import hooks
+
+        @hooks.register
+        def log_event(event):
+            logger.info('%s %s: %s', event.action, event.format, event.timings)
+"""
+
+import threading
+import warnings
+from contextlib import contextmanager
+from functools import wraps
+from time import perf_counter
+
+_hooks = []
+_local = threading.local()
+_lock = threading.Lock()
+
+# Number of events currently being recorded, in any thread. Checked before
+# timing fine grained phases so that they cost nothing without hooks.
+recording = 0
+
+
+class Event:
+    """Describes one instrumented call.
+
+    :param action: ``'load'``, ``'export'`` or ``'detect'``.
+    :param target: ``'dataset'``, ``'databook'`` or ``'stream'``.
+    :param format: format key, once known.
+    :param rows: number of rows loaded or exported.
+    :param cols: number of columns loaded or exported.
+    :param size: bytes (or characters for text) read or written, if known.
+    :param timings: seconds spent per phase (``detect``, ``parse``,
+                    ``validate``, ``package``, ``serialize``). Phases are
+                    exclusive, a nested phase is not counted in its parent.
+    :param duration: total seconds spent in the call.
+    :param error: the exception raised by the call, if any.
+    """
+
+    __slots__ = ['action', 'target', 'format', 'rows', 'cols', 'size',
+                 'timings', 'duration', 'error', '_phases']
+
+    def __init__(self, action, target, format=None):
+        self.action = action
+        self.target = target
+        self.format = format
+        self.rows = None
+        self.cols = None
+        self.size = None
+        self.timings = {}
+        self.duration = None
+        self.error = None
+        # [name, start, children time] of the currently open phases
+        self._phases = []
+
+    def __repr__(self):
+        return '<%s %s event format=%r rows=%r cols=%r size=%r duration=%r>' % (
+            self.action, self.target, self.format, self.rows, self.cols,
+            self.size, self.duration
+        )
+
+
+def register(callback):
+    """Registers `callback` to be called with every :class:`Event`.
+    Returns `callback`, so it can be used as a decorator."""
+    with _lock:
+        _hooks.append(callback)
+    return callback
+
+
+def unregister(callback):
+    """Removes a callback added with :func:`register`."""
+    with _lock:
+        _hooks.remove(callback)
+
+
+def current():
+    """Returns the :class:`Event` recorded in the current thread, or None."""
+    return getattr(_local, 'event', None)
+
+
+@contextmanager
+def event(action, target, format=None):
+    """Records an :class:`Event` and emits it to the hooks on exit.
+
+    Yields None when no hook is registered or when an event is already being
+    recorded in this thread: nested calls (like a Databook exporting its
+    sheets) only add their phase timings to the outer event.
+    """
+    global recording
+
+    if not _hooks or current() is not None:
+        yield None
+        return
+
+    evt = Event(action, target, format)
+    _local.event = evt
+    with _lock:
+        recording += 1
+    start = perf_counter()
+    try:
+        yield evt
+    except BaseException as exc:
+        evt.error = exc
+        raise
+    finally:
+        evt.duration = perf_counter() - start
+        _local.event = None
+        with _lock:
+            recording -= 1
+        for callback in list(_hooks):
+            # A failing hook must not replace the result or the error of
+            # the instrumented call.
+            try:
+                callback(evt)
+            except Exception as exc:
+                warnings.warn('Tablib hook %r failed: %r' % (callback, exc), RuntimeWarning)
+
+
+@contextmanager
+def phase(name):
+    """Times the enclosed block as the `name` phase of the current event."""
+    evt = current()
+    if evt is None or any(frame[0] == name for frame in evt._phases):
+        # Not recording, or re-entering a phase which is already timed.
+        yield
+        return
+
+    frame = [name, perf_counter(), 0.0]
+    evt._phases.append(frame)
+    try:
+        yield
+    finally:
+        evt._phases.pop()
+        elapsed = perf_counter() - frame[1]
+        evt.timings[name] = evt.timings.get(name, 0.0) + elapsed - frame[2]
+        if evt._phases:
+            evt._phases[-1][2] += elapsed
+
+
+def timed(name):
+    """Decorator timing each call of the function as the `name` phase."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not recording:
+                return func(*args, **kwargs)
+            with phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def size_of(data):
+    """Returns the length of str or bytes `data`, or the current position of
+    a file-like object. Returns None when the size cannot be known."""
+    if isinstance(data, (str, bytes)):
+        return len(data)
+    try:
+        return data.tell()
+    except (AttributeError, OSError, ValueError):
+        return None
@@ -0,0 +1,435 @@
+"""
+    tablib.storage
+    ~~~~~~~~~~~~~~
+
+    Row stores of :class:`~tablib.Dataset` objects.
+
+    By default the rows of a ``Dataset`` are held in a list. With
+    ``storage='disk'``, or a :class:`DiskStorage`, they are pickled in chunks to
+    a temporary directory and only a bounded number of chunks is kept in
+    memory, so tables larger than memory can be loaded, appended to, iterated
+    and exported. ::
+
+        data = tablib.Dataset(storage=tablib.DiskStorage(chunk_size=50000))
+        data.load(open('huge.csv'), format='csv')
+
+    With ``storage='deque'``, rows are held in a :class:`DequeRows`, which
+    pushes and pops rows at both ends in amortized constant time, for datasets
+    used as queues or rolling windows with ``lpush`` and ``lpop``.
+"""
+
+import gc
+import os
+import pickle
+import tempfile
+from bisect import bisect_right
+from collections import OrderedDict
+from collections.abc import MutableSequence
+from itertools import accumulate, chain, islice
+
+DEFAULT_CHUNK_SIZE = 10000
+DEFAULT_CACHE_CHUNKS = 4
+
+
+class DiskStorage:
+    """Stores the rows of a :class:`~tablib.Dataset` on disk.
+
+    :param chunk_size: number of rows per chunk file.
+    :param cache_chunks: number of chunks kept in memory, least recently used
+                         chunks being written back to disk first. The first
+                         chunk is kept in memory as well, as datasets read
+                         their first row for the width of the rows.
+    :param dir: (optional) directory in which the temporary directory of each
+                row store is created. Defaults to the system temporary
+                directory.
+    """
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE, cache_chunks=DEFAULT_CACHE_CHUNKS, dir=None):
+        if chunk_size < 1 or cache_chunks < 1:
+            raise ValueError('chunk_size and cache_chunks must be at least 1')
+        self.chunk_size = chunk_size
+        self.cache_chunks = cache_chunks
+        self.dir = dir
+
+    def __repr__(self):
+        return '<DiskStorage chunk_size=%r cache_chunks=%r>' % (self.chunk_size, self.cache_chunks)
+
+    def __call__(self, rows=()):
+        """Returns a new :class:`DiskRows` holding `rows`."""
+        return DiskRows(rows, self.chunk_size, self.cache_chunks, self.dir)
+
+
+def get_storage(storage):
+    """Returns the row store factory for the `storage` option of a Dataset:
+    ``None`` or ``'memory'`` for a list, ``'deque'`` for a :class:`DequeRows`,
+    ``'disk'`` for a default :class:`DiskStorage`, or a callable building a
+    mutable sequence from an iterable of rows."""
+    if storage is None or storage == 'memory':
+        return list
+    if storage == 'deque':
+        return DequeRows
+    if storage == 'disk':
+        return DiskStorage()
+    if not callable(storage):
+        raise ValueError("storage must be 'memory', 'deque', 'disk' or a callable, not %r" % (storage,))
+    return storage
+
+
+class DequeRows(MutableSequence):
+    """A list-like sequence of rows with constant time indexing, and amortized
+    constant time insertion and removal at both ends.
+
+    Rows are split between a head list, holding the first rows in reverse
+    order, and a tail list holding the others, so that both ends are the end
+    of a list. When popping from an end whose list is empty, half of the
+    other list is moved over.
+    """
+
+    def __init__(self, rows=()):
+        self._head = []
+        self._tail = list(rows)
+
+    def __repr__(self):
+        return '<DequeRows: %d rows>' % len(self)
+
+    def __reduce__(self):
+        return (DequeRows, (list(self),))
+
+    def __len__(self):
+        return len(self._head) + len(self._tail)
+
+    def __iter__(self):
+        return chain(reversed(self._head), self._tail)
+
+    def __reversed__(self):
+        return chain(reversed(self._tail), self._head)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        rows, offset = self._locate(index)
+        return rows[offset]
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            rows = list(self)
+            rows[index] = value
+            self._head, self._tail = [], rows
+            return
+        rows, offset = self._locate(index)
+        rows[offset] = value
+
+    def __delitem__(self, index):
+        if isinstance(index, slice):
+            rows = list(self)
+            del rows[index]
+            self._head, self._tail = [], rows
+            return
+        rows, offset = self._locate(index)
+        del rows[offset]
+
+    def insert(self, index, row):
+        size = len(self)
+        if index < 0:
+            index += size
+        if index >= size:
+            self._tail.append(row)
+        elif index <= 0:
+            self._head.append(row)
+        elif index <= len(self._head):
+            self._head.insert(len(self._head) - index, row)
+        else:
+            self._tail.insert(index - len(self._head), row)
+
+    def append(self, row):
+        self._tail.append(row)
+
+    def appendleft(self, row):
+        self._head.append(row)
+
+    def extend(self, rows):
+        if rows is self:
+            rows = list(rows)
+        self._tail.extend(rows)
+
+    def pop(self, index=-1):
+        size = len(self)
+        if not size:
+            raise IndexError('pop from empty list')
+        if index in (0, -size):
+            return self.popleft()
+        if index in (-1, size - 1):
+            if not self._tail:
+                # The last rows are the first ones of the head.
+                half = (len(self._head) + 1) // 2
+                self._tail = self._head[half - 1::-1]
+                del self._head[:half]
+            return self._tail.pop()
+        rows, offset = self._locate(index)
+        return rows.pop(offset)
+
+    def popleft(self):
+        if not self._head:
+            if not self._tail:
+                raise IndexError('pop from empty list')
+            half = (len(self._tail) + 1) // 2
+            self._head = self._tail[half - 1::-1]
+            del self._tail[:half]
+        return self._head.pop()
+
+    def clear(self):
+        self._head, self._tail = [], []
+
+    def iter_from(self, start):
+        """Iterates over the rows from position `start`."""
+        head = len(self._head)
+        if start < head:
+            return chain(reversed(self._head[:head - start]), self._tail)
+        return iter(self._tail[start - head:])
+
+    def _locate(self, index):
+        """Returns the list holding row `index` and the offset of the row in
+        it."""
+        head = len(self._head)
+        if index < 0:
+            index += head + len(self._tail)
+        if not 0 <= index < head + len(self._tail):
+            raise IndexError('list index out of range')
+        if index < head:
+            return self._head, head - 1 - index
+        return self._tail, index - head
+
+
+class DiskRows(MutableSequence):
+    """A list-like sequence of rows pickled in chunks to a temporary
+    directory, which is removed once the sequence is garbage collected or
+    closed.
+
+    Rows are read and written through an LRU cache of chunks, the first
+    chunk always staying in memory besides them. Rows fetched from the
+    sequence must be assigned back for changes to be kept.
+    """
+
+    def __init__(self, rows=(), chunk_size=DEFAULT_CHUNK_SIZE,
+                 cache_chunks=DEFAULT_CACHE_CHUNKS, dir=None):
+        self.chunk_size = chunk_size
+        self.cache_chunks = max(cache_chunks, 1)
+        self.dir = dir
+        self._tmpdir = tempfile.TemporaryDirectory(prefix='tablib-', dir=dir)
+
+        # Chunk ids and lengths in row order, and the position of the first
+        # row of each chunk, rebuilt lazily when chunks are resized.
+        self._chunks = []
+        self._lengths = []
+        self._starts = []
+        self._len = 0
+        self._next_id = 0
+
+        # chunk id -> rows, least recently used first
+        self._cache = OrderedDict()
+        self._dirty = set()
+
+        self.extend(rows)
+
+    def __repr__(self):
+        return '<DiskRows: %d rows in %d chunks>' % (self._len, len(self._chunks))
+
+    def __reduce__(self):
+        return (DiskRows, (list(self), self.chunk_size, self.cache_chunks, self.dir))
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return self._iter_chunks(list(self._chunks))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._len))]
+        k, offset = self._locate(index)
+        return self._rows(self._chunks[k])[offset]
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._len)
+            if step != 1:
+                rows = list(self)
+                rows[index] = value
+                self._discard(self._detach())
+                self.extend(rows)
+                return
+            value = list(value)
+            old = self._detach()
+            rows = self._iter_chunks(old)
+            self.extend(islice(rows, start))
+            self.extend(value)
+            self.extend(islice(rows, max(stop - start, 0), None))
+            self._discard(old)
+            return
+
+        k, offset = self._locate(index)
+        cid = self._chunks[k]
+        self._rows(cid)[offset] = value
+        self._dirty.add(cid)
+
+    def __delitem__(self, index):
+        if isinstance(index, slice):
+            positions = range(*index.indices(self._len))
+            if not positions:
+                return
+            old = self._detach()
+            self.extend(row for i, row in enumerate(self._iter_chunks(old)) if i not in positions)
+            self._discard(old)
+            return
+
+        k, offset = self._locate(index)
+        cid = self._chunks[k]
+        del self._rows(cid)[offset]
+        self._dirty.add(cid)
+        self._len -= 1
+        self._lengths[k] -= 1
+        if not self._lengths[k]:
+            del self._chunks[k], self._lengths[k]
+            self._discard([cid])
+        self._starts = None
+
+    def insert(self, index, row):
+        if index < 0:
+            index = max(index + self._len, 0)
+        if index >= self._len:
+            self.append(row)
+            return
+
+        k, offset = self._locate(index)
+        cid = self._chunks[k]
+        rows = self._rows(cid)
+        rows.insert(offset, row)
+        self._dirty.add(cid)
+        self._len += 1
+        self._lengths[k] += 1
+        self._starts = None
+
+        if len(rows) >= 2 * self.chunk_size:
+            # Split grown chunks so that a chunk load stays bounded.
+            half = len(rows) // 2
+            tail = rows[half:]
+            del rows[half:]
+            self._lengths[k] = half
+            self._chunks.insert(k + 1, self._new_chunk(tail))
+            self._lengths.insert(k + 1, len(tail))
+
+    def append(self, row):
+        if not self._chunks or self._lengths[-1] >= self.chunk_size:
+            if self._starts is not None:
+                self._starts.append(self._len)
+            self._chunks.append(self._new_chunk([row]))
+            self._lengths.append(1)
+        else:
+            cid = self._chunks[-1]
+            self._rows(cid).append(row)
+            self._dirty.add(cid)
+            self._lengths[-1] += 1
+        self._len += 1
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def iter_from(self, start):
+        """Iterates over the rows from position `start`, reading the chunks
+        from the one holding it."""
+        if start >= self._len:
+            return
+        k, offset = self._locate(start)
+        chunks = self._chunks[k:]
+        yield from self._rows(chunks[0])[offset:]
+        yield from self._iter_chunks(chunks[1:])
+
+    def close(self):
+        """Removes the chunk files. The sequence cannot be used afterwards."""
+        self._cache.clear()
+        self._dirty.clear()
+        self._tmpdir.cleanup()
+
+    # ---------
+    # Internals
+    # ---------
+
+    def _path(self, cid):
+        return os.path.join(self._tmpdir.name, '%d.pickle' % cid)
+
+    def _new_chunk(self, rows):
+        cid = self._next_id
+        self._next_id += 1
+        self._cache[cid] = rows
+        self._dirty.add(cid)
+        self._evict()
+        return cid
+
+    def _rows(self, cid):
+        """Returns the list of rows of chunk `cid`, loading it if needed."""
+        rows = self._cache.get(cid)
+        if rows is None:
+            with open(self._path(cid), 'rb') as fh:
+                data = fh.read()
+            # Unpickling a chunk allocates many objects which trigger
+            # pointless garbage collections, so they are paused meanwhile.
+            gc_enabled = gc.isenabled()
+            gc.disable()
+            try:
+                rows = pickle.loads(data)
+            finally:
+                if gc_enabled:
+                    gc.enable()
+            self._cache[cid] = rows
+            self._evict()
+        else:
+            self._cache.move_to_end(cid)
+        return rows
+
+    def _evict(self):
+        # The first chunk is not counted, Dataset.width reads it on every
+        # append, which would otherwise reload it with a single cached chunk.
+        first = self._chunks[0] if self._chunks else None
+        while len(self._cache) > self.cache_chunks + (first in self._cache):
+            cid, rows = self._cache.popitem(last=False)
+            if cid == first:
+                self._cache[cid] = rows
+                continue
+            if cid in self._dirty:
+                with open(self._path(cid), 'wb') as fh:
+                    fh.write(pickle.dumps(rows, pickle.HIGHEST_PROTOCOL))
+                self._dirty.discard(cid)
+
+    def _locate(self, index):
+        """Returns the position of the chunk holding row `index` and the
+        offset of the row in it."""
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError('list index out of range')
+        if self._starts is None:
+            self._starts = [0]
+            self._starts.extend(accumulate(self._lengths[:-1]))
+        k = bisect_right(self._starts, index) - 1
+        return k, index - self._starts[k]
+
+    def _iter_chunks(self, chunks):
+        for cid in chunks:
+            yield from self._rows(cid)
+
+    def _detach(self):
+        """Empties the sequence, returning its chunks which stay readable
+        until given to :meth:`_discard`."""
+        old = self._chunks
+        self._chunks, self._lengths, self._starts, self._len = [], [], [], 0
+        return old
+
+    def _discard(self, chunks):
+        for cid in chunks:
+            self._cache.pop(cid, None)
+            self._dirty.discard(cid)
+            try:
+                os.remove(self._path(cid))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,190 @@
+"""
+    tablib.streaming
+    ~~~~~~~~~~~~~~~~
+
+    Processing of tabular streams too large to be loaded as a whole.
+"""
+
+import heapq
+import io
+import sys
+import tempfile
+from contextlib import ExitStack
+from operator import itemgetter
+
+from tablib.exceptions import HeadersNeeded, UnsupportedFormat
+from tablib.formats import registry
+from tablib.utils import (
+    COMPRESSIONS,
+    compress_output,
+    decompress_input,
+    normalize_input,
+    text_stream,
+)
+
+DEFAULT_MEMORY_LIMIT = 64 * 1024 * 1024
+# Sorted runs merged at once, each one being an open temporary file.
+DEFAULT_MAX_RUNS = 256
+
+
+def _row_size(row):
+    """Approximate memory used by a row list and its values."""
+    return sys.getsizeof(row) + sum(map(sys.getsizeof, row))
+
+
+def _sort_key(key, headers):
+    """Returns a function computing the sort key of a row list from `key`: a
+    header, a column index, a list of them, a callable, or None."""
+    if key is None or callable(key):
+        return key
+    columns = [key] if isinstance(key, (str, int)) else list(key)
+    positions = []
+    for column in columns:
+        if isinstance(column, str):
+            if not headers:
+                raise HeadersNeeded
+            if column not in headers:
+                raise KeyError(column)
+            column = headers.index(column)
+        positions.append(column)
+    return itemgetter(*positions)
+
+
+def _spill(fmt, rows, format_kwargs):
+    """Writes sorted `rows` to a temporary file and returns it rewound."""
+    run = tempfile.TemporaryFile(mode='w+', encoding='utf-8', newline='')
+    fmt.write_rows(run, rows, **format_kwargs)
+    run.seek(0)
+    return run
+
+
+def _merge(fmt, runs, sort_key, reverse, format_kwargs):
+    """Returns the rows of sorted `runs` merged in order, ties coming from
+    the earlier runs first."""
+    return heapq.merge(
+        *[fmt.read_rows(run, headers=False, **format_kwargs) for run in runs],
+        key=sort_key, reverse=reverse
+    )
+
+
+def _merge_spill(fmt, runs, sort_key, reverse, format_kwargs):
+    """Merges sorted `runs` to a new temporary run, closing them."""
+    try:
+        return _spill(fmt, _merge(fmt, runs, sort_key, reverse, format_kwargs), format_kwargs)
+    finally:
+        _close_all(runs)
+
+
+def external_sort(in_stream, format, key=None, out_stream=None, reverse=False,
+                  memory_limit=DEFAULT_MEMORY_LIMIT, headers=True, compression=None,
+                  max_runs=DEFAULT_MAX_RUNS, **kwargs):
+    """Sorts the rows of `in_stream` without loading it in memory as a whole.
+
+    Rows are read in chunks of about `memory_limit` bytes, each chunk is
+    sorted and spilled to a temporary file, then the sorted runs are merged
+    with :func:`heapq.merge` and written to `out_stream`. At most `max_runs`
+    runs are merged at once: every `max_runs` runs are merged into a longer
+    one as they are spilled, so that the number of open temporary files
+    stays bounded whatever the size of the input. Runs are read and
+    written with the `format` streaming code, so the sort works with the
+    formats having ``read_rows`` and ``write_rows`` (``csv``, ``tsv`` and
+    ``jsonl``). The sort is stable.
+
+    :param in_stream: file-like object, string or bytestring to sort. It is
+                      decompressed on the fly if compressed.
+    :param key: header, column index, or list of them, to sort on, or a
+                callable receiving each row as a list. Mind that CSV values
+                are strings: use a callable to sort on converted values.
+    :param out_stream: (optional) text file-like object receiving the sorted
+                       rows, or binary one when `compression` is given. If
+                       not given, the sorted content is returned.
+    :param memory_limit: approximate number of bytes of rows held in memory.
+    :param headers: whether the stream starts with a header row.
+    :param compression: (optional) ``'gzip'``, ``'bz2'``, ``'xz'`` or
+                        ``'zstd'`` to compress the output.
+    :param max_runs: number of sorted runs merged at once, at least 2.
+    :param \\*\\*kwargs: (optional) custom configuration to the format
+                        ``read_rows`` and ``write_rows``.
+    """
+    fmt = registry.get_format(format)
+    if not (hasattr(fmt, 'read_rows') and hasattr(fmt, 'write_rows')):
+        raise UnsupportedFormat('Format {} cannot be streamed.'.format(format))
+    if compression is not None and compression not in COMPRESSIONS:
+        raise ValueError('compression must be one of %s, not %r' % (', '.join(COMPRESSIONS), compression))
+    if max_runs < 2:
+        raise ValueError('max_runs must be at least 2')
+
+    # Sorted runs by level, a run of level n + 1 being the merge of max_runs
+    # runs of level n. Runs of higher levels hold earlier rows.
+    levels = []
+    with ExitStack() as stack:
+        source, compression_in = decompress_input(normalize_input(in_stream))
+        if compression_in is not None:
+            stack.callback(source.close)
+        source = stack.enter_context(text_stream(source))
+        stack.callback(_close_levels, levels)
+
+        def add_run(run):
+            for runs in levels:
+                runs.append(run)
+                if len(runs) < max_runs:
+                    return
+                run = _merge_spill(fmt, runs, sort_key, reverse, kwargs)
+                del runs[:]
+            levels.append([run])
+
+        rows = iter(fmt.read_rows(source, headers=headers, **kwargs))
+        header_row = next(rows, None) if headers else None
+        sort_key = _sort_key(key, header_row)
+
+        chunk, size = [], 0
+        for row in rows:
+            if not row:
+                continue
+            chunk.append(row)
+            size += _row_size(row)
+            if size >= memory_limit:
+                chunk.sort(key=sort_key, reverse=reverse)
+                add_run(_spill(fmt, chunk, kwargs))
+                chunk, size = [], 0
+        chunk.sort(key=sort_key, reverse=reverse)
+
+        if levels:
+            if chunk:
+                add_run(_spill(fmt, chunk, kwargs))
+            # Earlier rows first, so that the sort stays stable.
+            runs = [run for runs in reversed(levels) for run in runs]
+            while len(runs) > max_runs:
+                runs = [
+                    _merge_spill(fmt, runs[i:i + max_runs], sort_key, reverse, kwargs)
+                    for i in range(0, len(runs), max_runs)
+                ]
+            del levels[:]
+            levels.append(runs)
+            merged = _merge(fmt, runs, sort_key, reverse, kwargs)
+        else:
+            merged = chunk
+
+        if compression is None:
+            output = io.StringIO() if out_stream is None else out_stream
+            fmt.write_rows(output, merged, headers=header_row, **kwargs)
+        else:
+            output = io.BytesIO() if out_stream is None else out_stream
+            with compress_output(output, compression) as compressed:
+                text = io.TextIOWrapper(compressed, encoding='utf-8', newline='')
+                fmt.write_rows(text, merged, headers=header_row, **kwargs)
+                text.flush()
+                text.detach()
+
+    if out_stream is None:
+        return output.getvalue()
+
+
+def _close_all(files):
+    for fh in files:
+        fh.close()
+
+
+def _close_levels(levels):
+    for runs in levels:
+        _close_all(runs)
@@ -1,3 +1,5 @@
+import io
+from contextlib import contextmanager
 from io import BytesIO, StringIO
 
 
@@ -14,3 +16,134 @@ def normalize_input(stream):
     elif isinstance(stream, bytes):
         return BytesIO(stream)
     return stream
+
+
+def peek(stream, size=32):
+    """
+    Return the next `size` characters or bytes of a file-like object, leaving
+    its position unchanged. Return None if `stream` is not a readable stream,
+    or if it can neither seek back nor peek, like a text pipe.
+    """
+    if not hasattr(stream, 'read'):
+        return None
+    if not _seekable(stream):
+        if hasattr(stream, 'peek'):
+            # Buffered binary streams, like sys.stdin.buffer, can be peeked
+            # at without consuming them.
+            return stream.peek(size)[:size]
+        return None
+    position = stream.tell()
+    try:
+        return stream.read(size)
+    finally:
+        stream.seek(position)
+
+
+def _seekable(stream):
+    try:
+        return stream.seekable()
+    except AttributeError:
+        return hasattr(stream, 'seek') and hasattr(stream, 'tell')
+    except ValueError:
+        # Closed stream
+        return False
+
+
+# Magic bytes of the compressions handled transparently on load.
+COMPRESSION_SIGNATURES = (
+    ('gzip', b'\x1f\x8b'),
+    ('bz2', b'BZh'),
+    ('xz', b'\xfd7zXZ\x00'),
+    ('zstd', b'\x28\xb5\x2f\xfd'),
+)
+COMPRESSIONS = tuple(name for name, _ in COMPRESSION_SIGNATURES)
+
+
+def detect_compression(head):
+    """Return the compression of a stream starting with `head`, or None."""
+    if isinstance(head, bytes):
+        for name, signature in COMPRESSION_SIGNATURES:
+            if head.startswith(signature):
+                return name
+    return None
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        from tablib.exceptions import UnsupportedFormat
+        raise UnsupportedFormat(
+            "The 'zstd' compression is not available. You may want to install the "
+            "zstandard package (or `pip install tablib[zstd]`)."
+        )
+    return zstandard
+
+
+def decompress_input(stream):
+    """
+    Return `stream` and its compression. A compressed stream is replaced by
+    a file-like object decompressing it as it is read, so that it is never
+    decompressed as a whole in memory.
+    """
+    # Compression modules are only imported when needed, to keep
+    # `import tablib` fast.
+    compression = detect_compression(peek(stream, 8))
+    if compression == 'gzip':
+        import gzip
+        stream = gzip.GzipFile(fileobj=stream, mode='rb')
+    elif compression == 'bz2':
+        import bz2
+        stream = bz2.BZ2File(stream, mode='rb')
+    elif compression == 'xz':
+        import lzma
+        stream = lzma.LZMAFile(stream, mode='rb')
+    elif compression == 'zstd':
+        import shutil
+        import tempfile
+
+        # zstd readers cannot rewind, which format detection needs, so the
+        # stream is decompressed to a temporary file.
+        reader = _zstandard().ZstdDecompressor().stream_reader(stream)
+        decompressed = tempfile.TemporaryFile()
+        shutil.copyfileobj(reader, decompressed)
+        decompressed.seek(0)
+        stream = decompressed
+    return stream, compression
+
+
+def compress_output(stream, compression):
+    """
+    Return a binary file-like object writing to `stream` with `compression`
+    (one of ``'gzip'``, ``'bz2'``, ``'xz'`` or ``'zstd'``). Closing it
+    finishes the compressed data without closing `stream`.
+    """
+    if compression == 'gzip':
+        import gzip
+        return gzip.GzipFile(fileobj=stream, mode='wb')
+    if compression == 'bz2':
+        import bz2
+        return bz2.BZ2File(stream, mode='wb')
+    if compression == 'xz':
+        import lzma
+        return lzma.LZMAFile(stream, mode='wb')
+    if compression == 'zstd':
+        return _zstandard().ZstdCompressor().stream_writer(stream, closefd=False)
+    raise ValueError('compression must be one of %s, not %r' % (', '.join(COMPRESSIONS), compression))
+
+
+@contextmanager
+def text_stream(stream, encoding='utf-8-sig'):
+    """
+    Yield `stream` as a text file-like object, decoding binary streams with
+    `encoding`, UTF-8 with an optional BOM by default. The underlying stream
+    is left open.
+    """
+    if not isinstance(stream.read(0), bytes):
+        yield stream
+        return
+    wrapper = io.TextIOWrapper(stream, encoding=encoding, newline='')
+    try:
+        yield wrapper
+    finally:
+        wrapper.detach()
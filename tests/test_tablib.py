@@ -1,21 +1,33 @@
 #!/usr/bin/env python
 """Tests for Tablib."""
 
+import bz2
+import codecs
+import copy
 import datetime
 import doctest
+import gzip
 import json
+import lzma
+import os
 import pickle
+import tempfile
+import tracemalloc
 import unittest
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO, StringIO
 from pathlib import Path
 from uuid import uuid4
 
 import tablib
 from MarkupPy import markup
+from tablib import hooks
 from tablib.core import Row, detect_format
-from tablib.exceptions import UnsupportedFormat
+from tablib.exceptions import HeadersNeeded, InvalidDatasetIndex, UnsupportedFormat
 from tablib.formats import registry
+from tablib.formats._tablib import _decode
+from tablib.storage import DequeRows, DiskRows
 
 
 class BaseTestCase(unittest.TestCase):
@@ -174,6 +186,78 @@ class TablibTestCase(BaseTestCase):
 
         self.founders.append_col(new_col, header='first_again')
 
+    def test_add_lazy_column(self):
+        """Verify lazy columns are computed once, on first read."""
+        calls = []
+
+        def initials(row):
+            calls.append(row[1])
+            return row[0][0] + row[1][0]
+
+        self.founders.append_col(initials, header='initials', lazy=True)
+        self.assertEqual(self.founders.drop(['initials']).width, 3)
+        self.assertEqual(calls, [])
+
+        self.assertEqual(self.founders['initials'], ['JA', 'GW', 'TJ'])
+        self.assertEqual(self.founders.csv.splitlines()[1], 'John,Adams,90,JA')
+        self.assertEqual(calls, ['Adams', 'Washington', 'Jefferson'])
+
+        # Changed and added rows only are computed again.
+        self.founders[0] = ('James', 'Madison', 85)
+        self.founders.append(('Benjamin', 'Franklin', 84))
+        self.assertEqual(self.founders['initials'], ['JM', 'GW', 'TJ', 'BF'])
+        self.assertEqual(calls[3:], ['Madison', 'Franklin'])
+
+    def test_pop_lazy_column(self):
+        """Verify popped rows have their lazy cells computed."""
+        self.founders.append_col(lambda row: row[2] + 1, header='next', lazy=True)
+        self.assertEqual(self.founders.lpop(), ('John', 'Adams', 90, 91))
+        self.founders.append(('Abe', 'Lincoln', 80))
+        self.assertEqual(self.founders.pop(), ('Abe', 'Lincoln', 80, 81))
+        self.assertEqual(self.founders.rpop(), ('Thomas', 'Jefferson', 50, 51))
+
+    def test_add_lazy_column_executor(self):
+        """Verify lazy columns are computed by the given executor."""
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            self.founders.lpush_col(lambda row: row[2] * 2, header='double', lazy=True, executor=executor)
+            self.founders.append_col(lambda row: row[0], header='double_again', lazy=True)
+            self.assertEqual(self.founders['double'], [180, 134, 100])
+            self.assertEqual(self.founders['double_again'], [180, 134, 100])
+
+    def test_map_col(self):
+        """Verify map_col writes back the results in order."""
+        data = tablib.Dataset(*[(i, 'name%d' % i) for i in range(50)], headers=['id', 'name'])
+        data.map_col('id', lambda value: value * 2, workers=4, chunksize=3)
+        self.assertEqual(data['id'], [i * 2 for i in range(50)])
+
+        data.map_col(1, str.upper, workers=2, executor='process')
+        self.assertEqual(data['name'][:2], ['NAME0', 'NAME1'])
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            data.map_col(-1, str.lower, executor=executor)
+        self.assertEqual(data['name'][-1], 'name49')
+
+    def test_map_col_lazy_columns(self):
+        """Verify map_col has lazy columns computed again from the new values."""
+        data = tablib.Dataset((1,), (2,), headers=['a'])
+        data.append_col(lambda row: row[0] * 10, header='b', lazy=True)
+        self.assertEqual(data['b'], [10, 20])
+        data.map_col('a', lambda value: value + 1, workers=1)
+        self.assertEqual(data['b'], [20, 30])
+        data.map_col('b', str, workers=1)
+        data.map_col('a', lambda value: value + 1, workers=1)
+        self.assertEqual(data[:], [(3, '20'), (4, '30')])
+
+    def test_map_col_errors(self):
+        """Verify map_col rejects unknown columns and executors."""
+        with self.assertRaises(KeyError):
+            self.founders.map_col('middle_name', str)
+        with self.assertRaises(InvalidDatasetIndex):
+            self.founders.map_col(3, str)
+        with self.assertRaises(ValueError):
+            self.founders.map_col('gpa', str, executor='cluster')
+        self.assertEqual(self.founders['gpa'], [90, 67, 50])
+
     def test_header_slicing(self):
         """Verify slicing by headers."""
 
@@ -349,6 +433,25 @@ class TablibTestCase(BaseTestCase):
         )
         self.assertEqual(tablib.detect_format(_bunk), None)
 
+    def test_auto_format_detect_skips_unsniffed_formats(self):
+        """Formats failing their cheap check are not loaded for detection."""
+        registry.register('nonexistent', 'tablib.formats._nonexistent.NoFormat',
+                          sniff=lambda head: False)
+        registry.register('uninstalled', 'tablib.formats._nonexistent.NoFormat',
+                          requires=('tablib_nonexistent_dependency',))
+        try:
+            self.assertEqual(tablib.detect_format('1,2,3\n4,5,6\n'), 'csv')
+            self.assertEqual(registry._formats['nonexistent'],
+                             'tablib.formats._nonexistent.NoFormat')
+            self.assertFalse(registry.is_available('uninstalled'))
+            with self.assertRaises(UnsupportedFormat):
+                data.export('uninstalled')
+        finally:
+            for key in ('nonexistent', 'uninstalled'):
+                registry.unregister(key)
+        self.assertFalse(hasattr(tablib.Dataset, 'get_uninstalled'))
+        self.assertNotIn('uninstalled', registry._requires)
+
     def test_transpose(self):
         """Transpose a dataset."""
 
@@ -372,6 +475,19 @@ class TablibTestCase(BaseTestCase):
         data.append(('John', 'Tyler', 71))
         self.assertEqual(data.transpose().transpose().dict, data.dict)
 
+    def test_transpose_no_headers(self):
+        """Transpose a dataset without headers."""
+
+        data.append((1, 2, 3))
+        data.append((4, 5, 6))
+        data.title = 'numbers'
+        transposed = data.transpose()
+
+        self.assertIsNone(transposed.headers)
+        self.assertEqual(transposed[:], [(1, 4), (2, 5), (3, 6)])
+        self.assertEqual(transposed.title, 'numbers')
+        self.assertEqual(transposed.transpose()[:], data[:])
+
     def test_row_stacking(self):
         """Row stacking."""
 
@@ -405,6 +521,106 @@ class TablibTestCase(BaseTestCase):
         self.assertEqual(column_stacked[0],
                          ("John", "Adams", 90, "John", "Adams", 90))
 
+    def test_concat(self):
+        """Stack many datasets at the row level, aligned on headers."""
+
+        reordered = tablib.Dataset(headers=['gpa', 'first_name', 'age'])
+        reordered.append((80, 'James', 70), tags=['president'])
+        stacked = tablib.concat([self.founders, reordered, self.founders])
+
+        self.assertEqual(stacked.headers, ['first_name', 'last_name', 'gpa', 'age'])
+        self.assertEqual(stacked.height, 7)
+        self.assertEqual(stacked[0], self.john + (None,))
+        self.assertEqual(stacked[3], ('James', None, 80, 70))
+        self.assertEqual(stacked[6], self.tom + (None,))
+        self.assertEqual(stacked.filter('president')[:], [('James', None, 80, 70)])
+        self.assertEqual(
+            tablib.concat([reordered, self.founders], fill='')[1], (90, 'John', '', 'Adams')
+        )
+
+    def test_concat_by_position(self):
+        """Stack datasets by position."""
+
+        no_headers = tablib.Dataset(('Abe', 'Lincoln', 40))
+        stacked = tablib.concat([self.founders, no_headers], align=None)
+        self.assertEqual(stacked.headers, list(self.headers))
+        self.assertEqual(stacked[3], ('Abe', 'Lincoln', 40))
+        self.assertEqual(tablib.concat([no_headers, no_headers])[:], [no_headers[0]] * 2)
+
+        with self.assertRaises(HeadersNeeded):
+            tablib.concat([self.founders, no_headers])
+        with self.assertRaises(tablib.InvalidDimensions):
+            tablib.concat([self.founders, tablib.Dataset((1,))], align=None)
+
+    def test_concat_cols(self):
+        """Stack many datasets at the column level at once."""
+
+        ages = tablib.Dataset(*[(age,) for age in (90, 67, 50)], headers=['age'])
+        stacked = tablib.concat_cols([self.founders, ages, self.founders])
+
+        self.assertEqual(stacked.headers, list(self.headers) + ['age'] + list(self.headers))
+        self.assertEqual(stacked[0], self.john + (90,) + self.john)
+        self.assertEqual(stacked.height, 3)
+
+        no_headers = tablib.Dataset((1,), (2,), (3,))
+        self.assertEqual(tablib.concat_cols([no_headers, no_headers])[:], [(1, 1), (2, 2), (3, 3)])
+
+        with self.assertRaises(tablib.InvalidDimensions):
+            tablib.concat_cols([self.founders, tablib.Dataset((1,), headers=['one'])])
+        with self.assertRaises(HeadersNeeded):
+            tablib.concat_cols([self.founders, no_headers])
+        with self.assertRaises(tablib.InvalidDatasetType):
+            tablib.concat_cols([self.founders, [1, 2, 3]])
+
+    def test_filter(self):
+        """Filter rows by tags, using the tag index."""
+
+        data.append(('a',), tags=['x'])
+        data.append(('b',), tags=['y', 'y'])
+        data.append(('c',), tags=['x', 'y'])
+        self.assertEqual(data.filter('x')[:], [('a',), ('c',)])
+        self.assertEqual(data.filter(['x', 'y'])[:], [('a',), ('b',), ('c',)])
+        self.assertEqual(data.filter('y').filter('x')[:], [('c',)])
+        self.assertEqual(data.filter('z')[:], [])
+        self.assertEqual(data.filter(None)[:], [])
+
+        # The index follows appends and other changes to the rows.
+        data.append(('d',), tags=['y'])
+        self.assertEqual(data.filter('y')[:], [('b',), ('c',), ('d',)])
+        data.lpush(('e',), tags=['y'])
+        del data[1]
+        self.assertEqual(data.filter('y')[:], [('e',), ('b',), ('c',), ('d',)])
+        data[0] = ('f',)
+        data.append(('g',), tags=['y'])
+        self.assertEqual(data.filter('y')[:], [('b',), ('c',), ('d',), ('g',)])
+
+    def test_where(self):
+        """Filter rows with a callable or a column expression."""
+
+        col = tablib.col
+        self.assertEqual(self.founders.where(lambda row: row[2] > 60)[:], [self.john, self.george])
+        self.assertEqual(self.founders.where(col('gpa') > 60)[:], [self.john, self.george])
+        self.assertEqual(
+            self.founders.where((col('gpa') < 80) & col('first_name').isin(['George', 'John']))[:],
+            [self.george]
+        )
+        self.assertEqual(
+            self.founders.where(~(col(2) == 67) | (col('last_name') == 'Washington'))[:],
+            [self.john, self.george, self.tom]
+        )
+        self.assertEqual(self.founders.where(col('gpa') * 2 - 100 >= 80)[:], [self.john])
+        self.assertEqual(self.founders.where(col('last_name').apply(len) == 5)[:], [self.john])
+        filtered = self.founders.where(col('gpa').is_none())
+        self.assertEqual((filtered.height, filtered.headers), (0, list(self.headers)))
+
+        with self.assertRaises(KeyError):
+            self.founders.where(col('age') > 1)
+        # Chained comparisons and `and` would keep a single expression.
+        with self.assertRaises(TypeError):
+            self.founders.where(60 < col('gpa') < 80)
+        with self.assertRaises(TypeError):
+            self.founders.where(col('gpa') > 60 and col('gpa') < 80)
+
     def test_sorting(self):
         """Sort columns."""
 
@@ -422,6 +638,134 @@ class TablibTestCase(BaseTestCase):
         self.assertEqual(second_row, expected_second)
         self.assertEqual(third_row, expected_third)
 
+    def test_join(self):
+        """Hash join two datasets on a key column."""
+
+        terms = tablib.Dataset(headers=['last_name', 'term', 'first_name'])
+        terms.append(('Washington', 1789, 'George'))
+        terms.append(('Adams', 1797, 'John'))
+        terms.append(('Adams', 1825, 'John Quincy'))
+        terms.append(('Madison', 1809, 'James'))
+
+        joined = self.founders.join(terms, on='last_name')
+        self.assertEqual(joined.headers, ['first_name', 'last_name', 'gpa', 'term', 'first_name'])
+        self.assertEqual(joined[:], [
+            ('John', 'Adams', 90, 1797, 'John'),
+            ('John', 'Adams', 90, 1825, 'John Quincy'),
+            ('George', 'Washington', 67, 1789, 'George'),
+        ])
+
+        joined = self.founders.join(terms, on=['last_name', 'first_name'], how='left')
+        self.assertEqual(joined.headers, ['first_name', 'last_name', 'gpa', 'term'])
+        self.assertEqual(joined['term'], [1797, 1789, None])
+
+        # Built on the smaller side, the output order is the same.
+        joined = terms.join(self.founders, on='last_name', how='outer')
+        self.assertEqual(joined['gpa'], [67, 90, 90, None, 50])
+        self.assertEqual(
+            self.founders.join(terms, on='last_name', how='outer')[-1],
+            (None, 'Madison', None, 1809, 'James')
+        )
+
+        with self.assertRaises(KeyError):
+            self.founders.join(terms, on='gpa')
+        with self.assertRaises(HeadersNeeded):
+            self.founders.join(tablib.Dataset((1, 2)), on='gpa')
+
+    def test_group_by(self):
+        """Aggregate rows grouped by key columns."""
+
+        sales = tablib.Dataset(headers=['region', 'product', 'amount'])
+        sales.extend([
+            ('north', 'tea', 10), ('south', 'tea', 5), ('north', 'coffee', 20),
+            ('north', 'tea', None), ('south', 'coffee', 7),
+        ])
+
+        summary = sales.group_by('region').agg({'amount': 'sum', 'product': 'count'})
+        self.assertEqual(summary.headers, ['region', 'amount', 'product'])
+        self.assertEqual(summary[:], [('north', 30, 3), ('south', 12, 2)])
+
+        summary = sales.group_by(['region', 'product']).agg({'amount': 'mean'})
+        self.assertEqual(summary[0], ('north', 'tea', 10))
+        self.assertEqual(summary.height, 4)
+
+        summary = sales.group_by(1).agg({2: 'max', 0: sorted})
+        self.assertEqual(summary[:], [('tea', 10, ['north', 'north', 'south']),
+                                      ('coffee', 20, ['north', 'south'])])
+        self.assertEqual(sales.group_by('region').agg({'amount': 'min'})['amount'], [10, 5])
+
+        with self.assertRaises(ValueError):
+            sales.group_by('region').agg({'amount': 'median'})
+        with self.assertRaises(KeyError):
+            sales.group_by('country').agg({'amount': 'sum'})
+
+    def test_select_drop(self):
+        self.founders.append_separator('sep')
+        self.founders.append(('Abe', 'Lincoln', 80), tags=['president'])
+
+        selected = self.founders.select(['gpa', 0])
+        self.assertEqual(selected.headers, ['gpa', 'first_name'])
+        self.assertEqual(selected[0], (90, 'John'))
+        self.assertEqual(selected.filter('president')[:], [(80, 'Abe')])
+        self.assertEqual(selected._separators, self.founders._separators)
+
+        dropped = self.founders.drop(['last_name', -1])
+        self.assertEqual(dropped.headers, ['first_name'])
+        self.assertEqual(dropped['first_name'], self.founders['first_name'])
+
+        with self.assertRaises(KeyError):
+            self.founders.select(['age'])
+        with self.assertRaises(InvalidDatasetIndex):
+            self.founders.drop([5])
+
+    def test_header_positions_follow_header_changes(self):
+        self.assertEqual(self.founders['gpa'], [90, 67, 50])
+        self.founders.insert_col(0, [1, 2, 3], header='id')
+        self.assertEqual(self.founders['gpa'], [90, 67, 50])
+        del self.founders['first_name']
+        self.assertEqual(self.founders['gpa'], [90, 67, 50])
+        self.founders.headers = ['gpa', 'last_name', 'score']
+        self.assertEqual(self.founders['gpa'], [1, 2, 3])
+        with self.assertRaises(KeyError):
+            self.founders['id']
+
+    def test_header_positions_follow_renames_in_place(self):
+        self.assertEqual(self.founders['gpa'], [90, 67, 50])
+        self.founders.headers[2] = 'score'
+        self.assertEqual(self.founders['score'], [90, 67, 50])
+        with self.assertRaises(KeyError):
+            self.founders['gpa']
+
+    def test_iter(self):
+        self.assertEqual(list(self.founders), self.founders[:])
+        self.assertEqual([row for row in tablib.Dataset()], [])
+
+    def test_iter_rows(self):
+        rows = list(self.founders.iter_rows(as_='list', cols=['gpa', 'first_name']))
+        self.assertEqual(rows[0], [90, 'John'])
+        rows[0].append(1)
+        self.assertEqual(self.founders[0], ('John', 'Adams', 90))
+
+        self.assertEqual(list(self.founders.iter_rows(cols=[2])), [(90,), (67,), (50,)])
+        self.assertEqual(next(self.founders.iter_rows(as_='dict')),
+                         {'first_name': 'John', 'last_name': 'Adams', 'gpa': 90})
+
+        records = list(self.founders.iter_rows(as_='namedtuple'))
+        self.assertEqual(records[1].last_name, 'Washington')
+        self.assertIs(type(records[0]), type(next(self.founders.iter_rows(as_='namedtuple'))))
+
+        with self.assertRaises(HeadersNeeded):
+            list(tablib.Dataset((1, 2)).iter_rows(as_='dict'))
+        # Stored rows, without copies.
+        rows = list(self.founders.iter_rows(as_='row'))
+        self.assertIs(rows[0], self.founders._data[0])
+        self.assertEqual(rows[2], list(self.tom))
+
+        with self.assertRaises(ValueError):
+            self.founders.iter_rows(as_='set')
+        with self.assertRaises(ValueError):
+            self.founders.iter_rows(as_='row', cols=[0])
+
     def test_remove_duplicates(self):
         """Unique Rows."""
 
@@ -440,6 +784,33 @@ class TablibTestCase(BaseTestCase):
         self.assertEqual(self.founders[2], self.tom)
         self.assertEqual(self.founders.height, 3)
 
+    def test_remove_duplicates_options(self):
+        """Unique rows on key columns, keeping first or last, by fingerprint."""
+
+        data.headers = ['name', 'version']
+        data.extend([('a', 1), ('b', 1), ('a', 2), ('a', 1), ('c', 3)])
+        data.append(('b', 2), tags=['new'])
+
+        dedup = data.subset()
+        self.assertEqual(dedup.remove_duplicates(), 1)
+        self.assertEqual(dedup['version'], [1, 1, 2, 3, 2])
+
+        dedup = data.subset()
+        self.assertEqual(dedup.remove_duplicates(subset=['name']), 3)
+        self.assertEqual(dedup[:], [('a', 1), ('b', 1), ('c', 3)])
+
+        dedup = data.filter(['new']).stack(data)
+        self.assertEqual(dedup.remove_duplicates(subset=[0], keep='last'), 4)
+        self.assertEqual(dedup[:], [('a', 1), ('c', 3), ('b', 2)])
+        self.assertEqual(dedup.filter('new')[:], [('b', 2)])
+
+        dedup = data.subset()
+        self.assertEqual(dedup.remove_duplicates(fingerprint=True), 1)
+        self.assertEqual(dedup.height, 5)
+
+        with self.assertRaises(ValueError):
+            data.remove_duplicates(keep='none')
+
     def test_wipe(self):
         """Purge a dataset."""
 
@@ -599,6 +970,90 @@ class TablibTestCase(BaseTestCase):
         # Act / Assert
         self.assertTrue(john.has_tag(["tag2", "tag1"]))
 
+    def test_row_shared_empty_tags(self):
+        """Untagged rows share their empty tags, tagged rows own theirs."""
+        john, george = Row(self.john), Row(self.george)
+        self.assertIs(john.tags, george.tags)
+        self.assertEqual(list(john.tags), [])
+
+        tagged = Row(self.john, tags=['tag1'])
+        self.assertEqual(tagged.tags, ['tag1'])
+        self.assertEqual(pickle.loads(pickle.dumps(tagged)).tags, ['tag1'])
+
+        # String tags are interned, whatever string object they come from.
+        other = Row(self.george, tags=[''.join(['tag', '1']), 2])
+        self.assertIs(other.tags[0], tagged.tags[0])
+        self.assertEqual(other.tags, ['tag1', 2])
+
+    def test_row_setstate(self):
+        """Row state from former pickles is restored."""
+        row = Row.__new__(Row)
+        row.__setstate__({'_row': ['John', 'Adams', 90], 'tags': ['tag1']})
+        self.assertEqual(row.list, ['John', 'Adams', 90])
+        self.assertTrue(row.has_tag('tag1'))
+
+
+class HooksTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.events = []
+        hooks.register(self.events.append)
+
+    def tearDown(self):
+        hooks.unregister(self.events.append)
+
+    def test_failing_hook(self):
+        def fail(event):
+            raise RuntimeError('hook failure')
+
+        expected = self.founders.csv
+        hooks.register(fail)
+        try:
+            with self.assertWarns(RuntimeWarning):
+                self.assertEqual(self.founders.export('csv'), expected)
+            with self.assertWarns(RuntimeWarning), self.assertRaises(UnsupportedFormat):
+                tablib.Dataset().export('nope')
+        finally:
+            hooks.unregister(fail)
+
+    def test_export_event(self):
+        _csv = self.founders.export('csv')
+        event, = self.events
+        self.assertEqual((event.action, event.target, event.format), ('export', 'dataset', 'csv'))
+        self.assertEqual((event.rows, event.cols, event.size), (3, 3, len(_csv)))
+        self.assertIn('serialize', event.timings)
+        self.assertIn('package', event.timings)
+        self.assertGreaterEqual(event.duration, sum(event.timings.values()))
+
+    def test_load_event_with_detection(self):
+        tablib.Dataset().load(self.founders.csv)
+        # The export from the descriptor and the load with detection
+        export_event, load_event = self.events
+        self.assertEqual(export_event.action, 'export')
+        self.assertEqual((load_event.action, load_event.format), ('load', 'csv'))
+        self.assertEqual((load_event.rows, load_event.cols), (3, 3))
+        self.assertTrue({'detect', 'parse', 'validate'} <= set(load_event.timings))
+
+    def test_databook_events(self):
+        book.add_sheet(self.founders)
+        book.add_sheet(self.founders)
+        tablib.Databook().load(book.export('json'), 'json')
+        export_event, load_event = self.events
+        self.assertEqual((export_event.target, export_event.rows), ('databook', 6))
+        self.assertEqual((load_event.action, load_event.rows, load_event.cols), ('load', 6, 3))
+
+    def test_detect_event(self):
+        tablib.detect_format('[{"a": 1}]')
+        event, = self.events
+        self.assertEqual((event.action, event.format), ('detect', 'json'))
+        self.assertEqual(list(event.timings), ['detect'])
+
+    def test_error_event(self):
+        with self.assertRaises(UnsupportedFormat):
+            self.founders.export('??')
+        event, = self.events
+        self.assertIsInstance(event.error, UnsupportedFormat)
+
 
 class HTMLTests(BaseTestCase):
     def test_html_export(self):
@@ -922,6 +1377,496 @@ class CSVTests(BaseTestCase):
         self.assertEqual(3, len(d2.headers))
 
 
+class JSONLinesTests(BaseTestCase):
+    def test_jsonl_export_import_set(self):
+        _jsonl = self.founders.export('jsonl')
+        self.assertEqual(
+            _jsonl.splitlines()[0], '{"first_name": "John", "last_name": "Adams", "gpa": 90}'
+        )
+        data.load(_jsonl, 'jsonl')
+        self.assertEqual(data.dict, self.founders.dict)
+
+        no_headers = tablib.Dataset((1, 'a'), (2, None))
+        self.assertEqual(no_headers.jsonl, '[1, "a"]\n[2, null]\n')
+        self.assertEqual(data.load(no_headers.jsonl, 'jsonl', headers=False)[:], no_headers[:])
+
+    def test_jsonl_format_detect(self):
+        self.assertEqual(tablib.detect_format(self.founders.jsonl), 'jsonl')
+        self.assertEqual(tablib.detect_format(self.founders.json), 'json')
+        self.assertEqual(tablib.detect_format('1,2,3\n4,5,6\n'), 'csv')
+
+
+class DiffTests(BaseTestCase):
+    def setUp(self):
+        self.old = tablib.Dataset(*[(i, 'n%d' % i, i) for i in range(6)],
+                                  headers=['id', 'name', 'value'])
+        # Same table with other columns order: 0-1 removed, 3 changed, 6-8 added.
+        self.new = tablib.Dataset(*[(i, i * 2 if i == 3 else i, 'n%d' % i) for i in range(2, 9)],
+                                  headers=['id', 'value', 'name'])
+
+    def test_diff(self):
+        for fingerprint in (False, True):
+            diff = self.old.diff(self.new, key='id', fingerprint=fingerprint)
+            self.assertEqual(diff.added.headers, ['id', 'name', 'value'])
+            self.assertEqual(diff.added[:], [(6, 'n6', 6), (7, 'n7', 7), (8, 'n8', 8)])
+            self.assertEqual(diff.removed[:], [(0, 'n0', 0), (1, 'n1', 1)])
+            self.assertEqual(diff.changed[:], [(3, 'n3', 6)])
+
+    def test_diff_whole_rows(self):
+        added, removed, changed = self.old.diff(self.new)
+        self.assertEqual((added.height, removed.height, changed.height), (4, 3, 0))
+        self.assertEqual(added[0], (3, 'n3', 6))
+
+    def test_diff_errors(self):
+        with self.assertRaises(tablib.InvalidDimensions):
+            self.old.diff(tablib.Dataset((1, 2), headers=['id', 'name']), key='id')
+        with self.assertRaises(HeadersNeeded):
+            tablib.Dataset((1, 2)).diff(tablib.Dataset((1, 3)), key='id')
+        diff = tablib.Dataset((1, 2)).diff(tablib.Dataset((1, 3)), key=0)
+        self.assertEqual(diff.changed[:], [(1, 3)])
+        with self.assertRaises(InvalidDatasetIndex):
+            tablib.Dataset().diff(tablib.Dataset(), key=0)
+
+    def test_diff_repeated_keys(self):
+        old = tablib.Dataset((1, 'a'), (2, 'b'), (1, 'c'), (1, 'd'), headers=['id', 'v'])
+        new = tablib.Dataset((1, 'a'), (1, 'x'), (2, 'b'), (2, 'e'), headers=['id', 'v'])
+        for fingerprint in (False, True):
+            added, removed, changed = old.diff(new, key='id', fingerprint=fingerprint)
+            self.assertEqual(added[:], [(2, 'e')])
+            self.assertEqual(removed[:], [(1, 'd')])
+            self.assertEqual(changed[:], [(1, 'x')])
+
+
+class IncrementalExportTests(BaseTestCase):
+    def test_export_incremental_csv(self):
+        out = StringIO()
+        data = tablib.Dataset(headers=self.headers)
+        data.append(self.john)
+        self.assertEqual(data.export_incremental(out, 'csv'), 1)
+        self.assertEqual(data.export_incremental(out, 'csv'), 0)
+        data.extend([self.george, self.tom])
+        self.assertEqual(data.export_incremental(out, 'csv'), 2)
+        self.assertEqual(out.getvalue(), self.founders.csv)
+
+        data[0] = ('James', 'Madison', 85)
+        with self.assertRaises(ValueError):
+            data.export_incremental(out, 'csv')
+        out = StringIO()
+        data.export_incremental(out, 'csv', restart=True)
+        self.assertEqual(out.getvalue(), data.csv)
+
+    def test_export_incremental_jsonl_binary(self):
+        out = BytesIO()
+        data = tablib.Dataset(self.john, headers=self.headers)
+        data.export_incremental(out, 'jsonl')
+        data.append(self.george)
+        data.append(self.tom)
+        data.export_incremental(out, 'jsonl')
+        self.assertEqual(out.getvalue().decode('utf-8'), self.founders.jsonl)
+
+        with self.assertRaises(UnsupportedFormat):
+            data.export_incremental(out, 'json')
+
+    def test_export_incremental_reads_new_rows_only(self):
+        for storage in ('deque', tablib.DiskStorage(chunk_size=2, cache_chunks=1)):
+            out = StringIO()
+            data = tablib.Dataset(*[(i, i * 2) for i in range(11)], headers=['a', 'b'],
+                                  storage=storage)
+            data.lpush((-1, -2))
+            data.export_incremental(out, 'csv')
+            rows = data._data
+            if isinstance(rows, DiskRows):
+                loaded = []
+                read_chunk = rows._rows
+                rows._rows = lambda cid: loaded.append(cid) or read_chunk(cid)
+            data.append((11, 22))
+            self.assertEqual(data.export_incremental(out, 'csv'), 1)
+            if isinstance(rows, DiskRows):
+                # The first chunk for the width, and the last one.
+                self.assertLessEqual(set(loaded), {rows._chunks[0], rows._chunks[-1]})
+            self.assertEqual(out.getvalue(), data.csv)
+            self.assertEqual(list(rows.iter_from(0)), list(rows))
+            self.assertEqual(list(rows.iter_from(11)), [[10, 20], [11, 22]])
+
+
+class ExternalSortTests(BaseTestCase):
+    def test_external_sort_csv(self):
+        in_stream = StringIO(self.founders.csv)
+        out_stream = StringIO()
+        # A tiny memory limit spills every row to its own sorted run.
+        tablib.external_sort(in_stream, 'csv', key='first_name', out_stream=out_stream,
+                             memory_limit=1)
+        self.assertEqual(out_stream.getvalue(), self.founders.sort('first_name').csv)
+
+        sorted_csv = tablib.external_sort(self.founders.csv, 'csv', key=lambda row: int(row[2]),
+                                          reverse=True, memory_limit=200)
+        self.assertEqual(sorted_csv, self.founders.sort('gpa', reverse=True).csv)
+
+    def test_external_sort_merge_passes(self):
+        data = tablib.Dataset(*[(i % 7, i) for i in range(60)], headers=['key', 'order'])
+        expected = data.sort('key').csv
+        # One run per row, merged a few at a time over several passes; ties
+        # keep their order.
+        for max_runs in (2, 3, 5):
+            sorted_csv = tablib.external_sort(data.csv, 'csv', key=lambda row: int(row[0]),
+                                              memory_limit=1, max_runs=max_runs)
+            self.assertEqual(sorted_csv, expected)
+        with self.assertRaises(ValueError):
+            tablib.external_sort(data.csv, 'csv', max_runs=1)
+
+    def test_external_sort_jsonl(self):
+        self.founders.append(('Abe', 'Adams', 90))
+        sorted_jsonl = tablib.external_sort(self.founders.jsonl, 'jsonl',
+                                            key=['last_name', 'gpa'], memory_limit=1)
+        self.assertEqual(tablib.import_set(sorted_jsonl, 'jsonl')['first_name'],
+                         ['John', 'Abe', 'Thomas', 'George'])
+
+        with self.assertRaises(KeyError):
+            tablib.external_sort(self.founders.jsonl, 'jsonl', key='age')
+        with self.assertRaises(UnsupportedFormat):
+            tablib.external_sort(self.founders.json, 'json')
+
+
+class CompressionTests(BaseTestCase):
+    def test_load_compressed_streams(self):
+        csv = self.founders.csv.encode('utf-8')
+        expected = tablib.Dataset().load(self.founders.csv).dict
+        for module in (gzip, bz2, lzma):
+            compressed = module.compress(csv)
+            self.assertEqual(tablib.detect_format(compressed), 'csv')
+            self.assertEqual(tablib.Dataset().load(compressed).dict, expected)
+            self.assertEqual(tablib.import_set(BytesIO(compressed), 'csv').dict, expected)
+
+        xlsx = gzip.compress(self.founders.xlsx)
+        self.assertEqual(tablib.Dataset().load(xlsx)['gpa'], self.founders['gpa'])
+        book = tablib.Databook([self.founders])
+        self.assertEqual(tablib.import_book(bz2.compress(book.xlsx)).sheets()[0]['gpa'],
+                         self.founders['gpa'])
+
+    def test_detect_undecodable_bytes(self):
+        self.assertIsNone(tablib.detect_format(bytes(range(256)) * 2))
+        self.assertIsNone(tablib.detect_format('a,b\né,2\n'.encode('latin-1')))
+
+    def test_load_from_pipe(self):
+        for data, mode in ((self.founders.csv.encode('utf-8'), 'r'),
+                           (gzip.compress(self.founders.csv.encode('utf-8')), 'rb')):
+            read_fd, write_fd = os.pipe()
+            with os.fdopen(write_fd, 'wb') as writer:
+                writer.write(data)
+            with os.fdopen(read_fd, mode) as reader:
+                self.assertEqual(tablib.Dataset().load(reader, 'csv').csv, self.founders.csv)
+
+    def test_load_from_current_position(self):
+        stream = BytesIO(b'# preamble\n' + self.founders.csv.encode('utf-8'))
+        stream.readline()
+        self.assertEqual(tablib.Dataset().load(stream, 'csv').csv, self.founders.csv)
+        stream.seek(0)
+        stream.readline()
+        self.assertEqual(tablib.Dataset().load(stream).csv, self.founders.csv)
+
+    def test_load_bytes_with_bom_or_utf16(self):
+        json_bytes = self.founders.json.encode('utf-8')
+        for data in (codecs.BOM_UTF8 + json_bytes, self.founders.json.encode('utf-16')):
+            self.assertEqual(tablib.Dataset().load(data, 'json').dict, self.founders.dict)
+        csv_bytes = codecs.BOM_UTF8 + self.founders.csv.encode('utf-8')
+        self.assertEqual(tablib.Dataset().load(csv_bytes, 'csv').headers, self.founders.headers)
+
+    def test_load_uncompressed_bytes_as_text(self):
+        self.assertEqual(tablib.Dataset().load(self.founders.csv.encode('utf-8')).dict,
+                         tablib.Dataset().load(self.founders.csv).dict)
+
+    def test_external_sort_compressed(self):
+        compressed = gzip.compress(self.founders.csv.encode('utf-8'))
+        out_stream = BytesIO()
+        tablib.external_sort(compressed, 'csv', key='first_name', out_stream=out_stream,
+                             compression='xz')
+        self.assertEqual(lzma.decompress(out_stream.getvalue()).decode('utf-8'),
+                         self.founders.sort('first_name').csv)
+        with self.assertRaises(ValueError):
+            tablib.external_sort(compressed, 'csv', compression='zip')
+
+
+class TablibBinaryTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dset = tablib.Dataset(headers=['id', 'name', 'score', 'ok', 'when', 'misc'],
+                                   title='typed')
+        self.dset.append((1, 'é', 1.5, True, datetime.date(2020, 1, 2), None), tags=['a'])
+        self.dset.append_separator('sep')
+        self.dset.append((None, None, float('inf'), False, None, (1, 2)))
+        self.dset.append((2 ** 40, '', -0.0, None, datetime.date(2021, 3, 4), 'x'), tags=['a', 'b'])
+
+    def assertSameDataset(self, loaded, dset):
+        self.assertEqual(loaded.title, dset.title)
+        self.assertEqual(loaded.headers, dset.headers)
+        self.assertEqual(loaded[:], dset[:])
+        self.assertEqual(loaded._separators, dset._separators)
+        self.assertEqual([row.tags for row in loaded._data], [row.tags for row in dset._data])
+
+    def test_tablib_export_import_set(self):
+        for compression in (None, 'zlib', 'bz2', 'lzma'):
+            exported = self.dset.export('tablib', compression=compression)
+            self.assertEqual(tablib.detect_format(exported), 'tablib')
+            self.assertSameDataset(tablib.Dataset().load(exported), self.dset)
+
+        empty = tablib.Dataset(headers=['a', 'b'])
+        self.assertSameDataset(tablib.Dataset().load(empty.tablib, 'tablib'), empty)
+        no_headers = tablib.Dataset((1, 'a'), (2, 'b'))
+        self.assertSameDataset(tablib.Dataset().load(no_headers.tablib, 'tablib'), no_headers)
+
+    def test_tablib_import_columns_from_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'typed.tablib'
+            path.write_bytes(self.dset.tablib)
+            with path.open('rb') as fh:
+                loaded = tablib.Dataset().load(fh, 'tablib', columns=['name', 0])
+        self.assertEqual(loaded.headers, ['name', 'id'])
+        self.assertEqual(loaded['id'], [1, None, 2 ** 40])
+        self.assertEqual(loaded['name'], ['é', None, ''])
+
+    def test_tablib_import_compressed_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'typed.tablib.gz'
+            path.write_bytes(gzip.compress(self.dset.tablib))
+            for format in (None, 'tablib'):
+                with path.open('rb') as fh:
+                    self.assertSameDataset(tablib.Dataset().load(fh, format), self.dset)
+
+    def test_tablib_import_refuses_unsafe_objects(self):
+        block = pickle.dumps([BytesIO()])
+        with self.assertRaises(pickle.UnpicklingError):
+            _decode('object', block, 1, False)
+
+    def test_tablib_export_refuses_unreadable_values(self):
+        with self.assertRaises(TypeError):
+            tablib.Dataset((BytesIO(),)).tablib
+        with self.assertRaises(TypeError):
+            tablib.Dataset(((1, BytesIO()),)).tablib
+        dset = tablib.Dataset((1,))
+        dset.append((2,), tags=[('a', 'b')])
+        with self.assertRaises(TypeError):
+            dset.tablib
+
+
+class DiskStorageTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        # Two rows per chunk and a single chunk in memory, so that nearly
+        # every access goes to disk.
+        self.storage = tablib.DiskStorage(chunk_size=2, cache_chunks=1)
+        self.rows = [(i, 'name%d' % i, i * 1.5) for i in range(11)]
+
+    def test_disk_dataset_append_iterate_export(self):
+        dset = tablib.Dataset(headers=['id', 'name', 'score'], storage=self.storage)
+        for row in self.rows:
+            dset.append(row, tags=['odd'] if row[0] % 2 else [])
+
+        memory = tablib.Dataset(*self.rows, headers=['id', 'name', 'score'])
+        self.assertEqual(dset.height, 11)
+        self.assertEqual(list(dset), self.rows)
+        self.assertEqual(dset[3], self.rows[3])
+        self.assertEqual(dset['name'], memory['name'])
+        self.assertEqual(dset.csv, memory.csv)
+        self.assertEqual(dset.jsonl, memory.jsonl)
+        self.assertEqual(dset.filter('odd')['id'], [1, 3, 5, 7, 9])
+        self.assertIsInstance(dset.filter('odd')._data, DiskRows)
+
+        loaded = tablib.Dataset(storage=self.storage).load(memory.csv, 'csv')
+        self.assertIsInstance(loaded._data, DiskRows)
+        self.assertEqual(loaded.dict, tablib.Dataset().load(memory.csv, 'csv').dict)
+
+    def test_disk_dataset_export_memory(self):
+        """Exports stream the rows of disk backed datasets."""
+        dset = tablib.Dataset(headers=['id', 'name', 'score'],
+                              storage=tablib.DiskStorage(chunk_size=500, cache_chunks=2))
+        dset.extend((i, 'name%d' % i, i * 0.5) for i in range(20000))
+        dset.add_formatter('score', str)
+
+        def peak(func):
+            tracemalloc.start()
+            try:
+                func()
+                return tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+        rows = peak(lambda: list(dset))
+        self.assertLess(peak(lambda: dset.export('csv')), rows)
+        with tempfile.TemporaryFile('w+', newline='') as fh:
+            self.assertLess(peak(lambda: dset.export_incremental(fh, 'csv')), rows / 4)
+            fh.seek(0)
+            self.assertEqual(fh.read(), dset.csv)
+
+    def test_disk_dataset_keeps_first_chunk(self):
+        """The first chunk, read for the width on append, stays in memory."""
+        dset = tablib.Dataset(headers=['id', 'name', 'score'], storage=self.storage)
+        dset.extend(self.rows)
+        chunks = dset._data
+        self.assertEqual(list(chunks._cache), [chunks._chunks[0], chunks._chunks[-1]])
+        dset[5]
+        self.assertEqual(set(chunks._cache), {chunks._chunks[0], chunks._chunks[2]})
+        del dset[0:2]
+        dset.append((11, 'name11', 16.5))
+        self.assertIn(chunks._chunks[0], chunks._cache)
+        self.assertEqual(len(chunks._cache), 2)
+        self.assertEqual(list(dset), self.rows[2:] + [(11, 'name11', 16.5)])
+
+    def test_disk_dataset_mutations(self):
+        dset = tablib.Dataset(*self.rows, storage=self.storage)
+        expected = list(self.rows)
+
+        dset.insert(3, (100, 'x', 0.0))
+        expected.insert(3, (100, 'x', 0.0))
+        dset.lpush((101, 'y', 0.0))
+        expected.insert(0, (101, 'y', 0.0))
+        del dset[5]
+        del expected[5]
+        dset[-1] = (102, 'z', 0.0)
+        expected[-1] = (102, 'z', 0.0)
+        self.assertEqual(dset.pop(), expected.pop())
+        self.assertEqual(dset.lpop(), expected.pop(0))
+        self.assertEqual(dset[:], expected)
+
+        dset.append((0, 'name0', 0.0))
+        self.assertEqual(dset.remove_duplicates(), 1)
+        dset.append_col([row[0] * 2 for row in expected])
+        self.assertEqual(dset.get_col(3), [row[0] * 2 for row in expected])
+
+        dset.wipe()
+        self.assertEqual(dset.height, 0)
+        self.assertIsInstance(dset._data, DiskRows)
+
+    def test_disk_storage_option(self):
+        self.assertIsInstance(tablib.Dataset(storage='disk')._data, DiskRows)
+        self.assertIsInstance(tablib.Dataset(storage='memory')._data, list)
+        with self.assertRaises(ValueError):
+            tablib.Dataset(storage='cloud')
+
+
+class DequeStorageTests(BaseTestCase):
+    def test_deque_rolling_window(self):
+        dset = tablib.Dataset(headers=['id'], storage='deque')
+        self.assertIsInstance(dset._data, DequeRows)
+        expected = []
+        for i in range(20):
+            dset.lpush((i,))
+            expected.insert(0, (i,))
+            self.assertEqual(dset[-1], expected[-1])
+            if i % 3 == 0:
+                self.assertEqual(dset.rpop(), expected.pop())
+            self.assertEqual(dset[:], expected)
+        while expected:
+            self.assertEqual(dset.lpop(), expected.pop(0))
+        with self.assertRaises(IndexError):
+            dset.lpop()
+
+    def test_deque_dataset_mutations(self):
+        rows = [(i, 'name%d' % i) for i in range(8)]
+        dset = tablib.Dataset(*rows, headers=['id', 'name'], storage='deque')
+        expected = list(rows)
+
+        dset.lpush((100, 'x'), tags=['new'])
+        expected.insert(0, (100, 'x'))
+        dset.insert(4, (101, 'y'))
+        expected.insert(4, (101, 'y'))
+        del dset[2]
+        del expected[2]
+        dset[1] = (102, 'z')
+        expected[1] = (102, 'z')
+        self.assertEqual(list(dset), expected)
+        self.assertEqual(dset.filter('new')['id'], [100])
+        self.assertEqual(dset.sort('id')._data.__class__, DequeRows)
+        self.assertEqual(
+            dset.csv, tablib.Dataset(*expected, headers=['id', 'name']).csv
+        )
+
+
+class CopyOnWriteTests(BaseTestCase):
+    def test_copy_shares_until_changed(self):
+        snapshot = self.founders.copy()
+        self.assertIs(snapshot._data, self.founders._data)
+        self.assertEqual(copy.copy(self.founders).dict, self.founders.dict)
+
+        self.founders.append(('Benjamin', 'Franklin', 84))
+        self.founders[0] = ('James', 'Madison', 85)
+        del snapshot[1]
+        self.assertEqual(self.founders['last_name'], ['Madison', 'Washington', 'Jefferson', 'Franklin'])
+        self.assertEqual(snapshot['last_name'], ['Adams', 'Jefferson'])
+        self.assertIs(snapshot._data[1], self.founders._data[2])
+
+    def test_column_changes_do_not_leak(self):
+        self.founders.append(('Benjamin', 'Franklin', 84), tags=['printer'])
+        printers = self.founders.filter('printer')
+        snapshot = self.founders.copy()
+        stacked = self.founders.stack(printers)
+
+        del printers['gpa']
+        snapshot.append_col(['a', 'b', 'c', 'd'], header='letter')
+        self.assertEqual(printers.headers, ['first_name', 'last_name'])
+        self.assertEqual(printers[0], ('Benjamin', 'Franklin'))
+        self.assertEqual(self.founders.headers, ['first_name', 'last_name', 'gpa'])
+        self.assertEqual(self.founders[-1], ('Benjamin', 'Franklin', 84))
+        self.assertEqual(stacked.width, 3)
+        self.assertEqual(snapshot.filter('printer')[0], ('Benjamin', 'Franklin', 84, 'd'))
+
+    def test_formatters_do_not_change_rows(self):
+        snapshot = self.founders.copy()
+        snapshot.add_formatter('last_name', str.upper)
+        self.assertEqual(snapshot.dict[0]['last_name'], 'ADAMS')
+        self.assertEqual(snapshot.dict[0]['last_name'], 'ADAMS')
+        self.assertEqual(self.founders[0], ('John', 'Adams', 90))
+        self.assertEqual(self.founders.dict[0]['last_name'], 'Adams')
+
+
+class ExportCacheTests(BaseTestCase):
+    def test_version_counts_changes(self):
+        versions = [self.founders.version]
+
+        def changed():
+            versions.append(self.founders.version)
+            return versions[-1] > versions[-2]
+
+        self.founders.append(('Benjamin', 'Franklin', 84))
+        self.assertTrue(changed())
+        self.founders[0] = ('James', 'Madison', 85)
+        self.assertTrue(changed())
+        self.founders.lpop()
+        self.assertTrue(changed())
+        self.founders.append_col(['a', 'b', 'c'], header='letter')
+        self.assertTrue(changed())
+        del self.founders['letter']
+        self.assertTrue(changed())
+        self.founders.headers = ['first', 'last', 'gpa']
+        self.assertTrue(changed())
+        self.founders.add_formatter('gpa', str)
+        self.assertTrue(changed())
+        self.founders.append_separator('Others')
+        self.assertTrue(changed())
+        self.founders.csv
+        self.founders.filter('x')
+        self.assertFalse(changed())
+        self.founders.wipe()
+        self.assertTrue(changed())
+
+    def test_export_cache(self):
+        data = tablib.Dataset(*self.founders, headers=self.headers, export_cache=2)
+        csv = data.csv
+        self.assertIs(data.csv, csv)
+        self.assertIs(data.export('csv'), csv)
+        self.assertIsNot(data.export('csv', delimiter=';'), csv)
+
+        data.append(('Benjamin', 'Franklin', 84))
+        self.assertIsNot(data.csv, csv)
+        self.assertTrue(data.csv.endswith('Benjamin,Franklin,84\r\n'))
+        data.headers[0] = 'first'
+        self.assertTrue(data.csv.startswith('first,'))
+
+        # Least recently used outputs are dropped, and the cache is opt-in.
+        data.json, data.tsv
+        self.assertEqual(len(data._export_cache), 2)
+        self.assertIsNot(self.founders.csv, self.founders.csv)
+
+
 class TSVTests(BaseTestCase):
     def test_tsv_import_set(self):
         """Generate and import TSV set serialization."""